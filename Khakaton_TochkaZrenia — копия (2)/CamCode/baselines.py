@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, запись остается атомарной
+    fcntl = None
+
+# Базовые показатели камер переживают перезапуск: после деплоя или падения
+# проверки битрейта/FPS работают с первого кадра, без прогрева окна.
+BASELINE_PATH = os.environ.get(
+    'BASELINE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json'))
+
+QUALITY_KEYS = ('sharpness', 'contrast', 'brightness', 'blockiness')
+
+
+class BaselineStore:
+    """
+    Базовые показатели камер: последние окна битрейта и FPS, средние метрики
+    качества (EWMA) и последнее разрешение. Файл пишется атомарно не чаще
+    раза в save_interval секунд. Файл общий для процессов (шарды, index.py и server.py):
+    каждый процесс дописывает в него только свои камеры, свежая запись побеждает.
+    """
+
+    def __init__(self, path=BASELINE_PATH, save_interval=60.0, max_age_sec=7 * 24 * 3600,
+                 max_samples=60, quality_alpha=0.1):
+        self.path = path
+        self.save_interval = save_interval
+        self.max_age_sec = max_age_sec  # Более старые показатели не используются
+        self.max_samples = max_samples
+        self.quality_alpha = quality_alpha
+        self._data = {}
+        self._changed = set()  # Камеры, обновленные этим процессом после последней записи
+        self._last_save = time.time()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Запись файла; _lock при этом не держится
+        self.load()
+
+    def _read(self):
+        """Камеры из файла на диске; при ошибке чтения - пустой словарь"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('cameras', {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[BASELINE_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+            return {}
+
+    def _merge(self, cameras):
+        """Показатели с диска поверх своих, если они свежее (камеру обновил другой процесс)"""
+        with self._lock:
+            for camera_id, baseline in cameras.items():
+                own = self._data.get(camera_id)
+                if own is None or baseline.get('updated', 0) > own.get('updated', 0):
+                    self._data[camera_id] = baseline
+
+    def load(self):
+        self._merge(self._read())
+
+    def restore(self, camera_id):
+        """Сохраненные показатели камеры или None (нет или устарели); файл перечитывается"""
+        self.load()
+        with self._lock:
+            baseline = self._data.get(camera_id)
+        if not baseline or time.time() - baseline.get('updated', 0) > self.max_age_sec:
+            return None
+        return baseline
+
+    def update(self, camera_id, bitrate_history, fps_history, resolution=None, quality=None):
+        """Снимок текущих окон монитора; quality - метрики качества последнего анализа"""
+        with self._lock:
+            baseline = self._data.setdefault(camera_id, {})
+            baseline['bitrate'] = [int(v) for v in bitrate_history[-self.max_samples:]]
+            baseline['fps'] = [round(float(v), 2) for v in fps_history[-self.max_samples:]]
+            if resolution is not None:
+                baseline['resolution'] = [int(v) for v in resolution]
+            if quality:
+                averages = baseline.setdefault('quality', {})
+                for key in QUALITY_KEYS:
+                    if key not in quality:
+                        continue
+                    value = float(quality[key])
+                    prev = averages.get(key)
+                    averages[key] = round(value if prev is None else prev + self.quality_alpha * (value - prev), 2)
+            baseline['updated'] = time.time()
+            self._changed.add(camera_id)
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    @contextmanager
+    def _file_lock(self):
+        """Межпроцессная блокировка файла на время чтения-слияния-записи"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self):
+        """
+        Атомарная запись: временный файл + os.replace. Под блокировкой файла текущий файл
+        перечитывается и в него вливаются только камеры этого процесса - другие процессы
+        не теряют свои. Отдельный замок записи: мониторы одного процесса не пишут общий
+        временный файл одновременно, и более старый снимок не заменяет файл после более нового.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                changed, self._changed = self._changed, set()
+                self._last_save = time.time()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with self._file_lock():
+                    cameras = self._read()
+                    with self._lock:
+                        for camera_id in changed:
+                            own = self._data.get(camera_id)
+                            disk = cameras.get(camera_id)
+                            if own and (disk is None or own.get('updated', 0) >= disk.get('updated', 0)):
+                                cameras[camera_id] = own
+                        payload = json.dumps({'version': 1, 'cameras': cameras},
+                                             ensure_ascii=False, separators=(',', ':'))
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                self._merge(cameras)
+            except OSError as e:
+                with self._lock:
+                    self._changed |= changed  # Повторить при следующем сохранении
+                print(f"[BASELINE_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+
+
+def seed_histories(baseline, resolution):
+    """
+    Окна битрейта и FPS для старта монитора.
+    Битрейт зависит от разрешения: при его смене старое окно битрейта не используется.
+    """
+    if not baseline:
+        return [], []
+    bitrate = list(baseline.get('bitrate', []))
+    if baseline.get('resolution') and list(baseline['resolution']) != [int(v) for v in resolution]:
+        bitrate = []
+    return bitrate, list(baseline.get('fps', []))
+
+
+# Общее хранилище процесса
+baselines = BaselineStore()
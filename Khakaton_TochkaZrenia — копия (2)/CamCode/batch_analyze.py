@@ -0,0 +1,252 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from frame_timing import FrameTiming
+from image_quality import QualityAnalyzer
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# Пакетный анализ записей: те же проверки, что у мониторов, но без реального времени.
+# Файлы распределяются по процессам, результат - метрики по секундам и найденные проблемы.
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.ts', '.h264', '.h265', '.mjpeg', '.mjpg')
+
+METRIC_FIELDS = ['file', 'second', 'frames', 'fps', 'jitter_ms', 'missing_frames', 'bitrate',
+                 'brightness', 'sharpness', 'sharpness_min', 'contrast', 'blockiness_max', 'issues']
+ISSUE_FIELDS = ['file', 'second', 'issue', 'frames']
+
+
+def collect_files(paths):
+    """Видеофайлы из списка файлов и каталогов (рекурсивно)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"WARNING: {path} не найден")
+    return files
+
+
+def check_bitrate_drop(current_bitrate, bitrate_history, window_size=30, threshold_ratio=0.3):
+    """Проверка падения битрейта (как check_bitrate_drop мониторов, пороги по умолчанию из camera_config)"""
+    if len(bitrate_history) < window_size:
+        return False
+    avg_bitrate = np.mean(bitrate_history[-window_size:])
+    return current_bitrate < avg_bitrate * threshold_ratio and avg_bitrate > 1000
+
+
+def check_fps_drop(current_fps, fps_history):
+    """Проверка падения FPS (как check_fps_drop мониторов)"""
+    if len(fps_history) < 10:
+        return False
+    avg_fps = sum(fps_history[-10:]) / 10
+    return current_fps < 5 or (avg_fps > 10 and current_fps < avg_fps * 0.2)
+
+
+def _second_row(path, second, bucket):
+    # FPS и джиттер - по интервалам кадров этой секунды, а не по скользящему окну FrameTiming
+    gaps = np.array(bucket['gaps'], dtype=np.float64)
+    spans = gaps * np.array(bucket['gap_frames'], dtype=np.float64)
+    row = {
+        'file': path,
+        'second': second,
+        'frames': bucket['frames'],
+        'fps': round(1000.0 * float(np.sum(bucket['gap_frames'])) / float(spans.sum()), 2) if spans.sum() > 0 else 0.0,
+        'jitter_ms': round(float(np.std(gaps)), 2) if len(gaps) > 1 else 0.0,
+        'missing_frames': bucket['missing'],
+        'bitrate': round(float(np.mean(bucket['bitrate'])), 1) if bucket['bitrate'] else None,
+        'brightness': None,
+        'sharpness': None,
+        'sharpness_min': None,
+        'contrast': None,
+        'blockiness_max': None,
+        'issues': '; '.join(f"{issue} ({count})" for issue, count in bucket['issues'].items())
+    }
+    if bucket['sharpness']:
+        row['brightness'] = round(float(np.mean(bucket['brightness'])), 2)
+        row['sharpness'] = round(float(np.mean(bucket['sharpness'])), 2)
+        row['sharpness_min'] = round(float(np.min(bucket['sharpness'])), 2)
+        row['contrast'] = round(float(np.mean(bucket['contrast'])), 2)
+    if bucket['blockiness']:
+        row['blockiness_max'] = round(float(np.max(bucket['blockiness'])), 2)
+    return row
+
+
+def _new_bucket():
+    return {'frames': 0, 'missing': 0, 'gaps': [], 'gap_frames': [], 'bitrate': [],
+            'brightness': [], 'sharpness': [], 'contrast': [], 'blockiness': [], 'issues': Counter()}
+
+
+def analyze_file(path, mode='advanced', stride=1):
+    """
+    Анализ одного файла с максимальной скоростью.
+    stride - анализировать каждый N-й кадр (остальные только grab, FPS считается по всем).
+    Возвращает (строки метрик по секундам, строки проблем, сводка файла).
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return [], [], {'file': path, 'error': 'не удалось открыть'}
+
+    timing = FrameTiming()
+    analyzer = QualityAnalyzer(os.path.basename(path)) if mode == 'advanced' else None
+    fps_history = []
+    bitrate_history = []
+    rows = []
+    issues = []
+    bucket = _new_bucket()
+    second = 0
+    frames = 0
+    started = time.time()
+    missing_before = 0
+    frame = None  # Буфер декодирования, переиспользуется между кадрами
+
+    def flush():
+        rows.append(_second_row(path, second, bucket))
+        issues.extend({'file': path, 'second': second, 'issue': issue, 'frames': count}
+                      for issue, count in bucket['issues'].items())
+
+    while True:
+        skipped = 0
+        while skipped < stride - 1 and cap.grab():
+            skipped += 1
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        frames += 1 + skipped
+        position_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        frame_second = int(position_sec)
+        if frame_second > second:
+            flush()
+            bucket = _new_bucket()
+            second = frame_second
+
+        # Время получения для файлов без меток - позиция кадра, а не время анализа
+        frame_fps = timing.on_frame(cap, position_sec, skipped)
+        bucket['frames'] += 1 + skipped
+        bucket['missing'] += timing.missing_total - missing_before
+        missing_before = timing.missing_total
+        if frame_fps is not None:
+            bucket['gaps'].append(timing.gaps[-1])
+            bucket['gap_frames'].append(1 + skipped)
+            if check_fps_drop(frame_fps, fps_history):
+                bucket['issues']["Падение FPS"] += 1
+            fps_history.append(frame_fps)
+            if len(fps_history) > 20:
+                fps_history.pop(0)
+
+        # Битрейт - та же оценка по кадру, что у мониторов (index.py, server.py)
+        current_bitrate = len(frame) * 8
+        if check_bitrate_drop(current_bitrate, bitrate_history):
+            bucket['issues']["Падение битрейта"] += 1
+        bucket['bitrate'].append(current_bitrate)
+        bitrate_history.append(current_bitrate)
+        if len(bitrate_history) > 60:
+            bitrate_history.pop(0)
+
+        if analyzer is not None:
+            metrics = analyzer.analyze(frame)
+            for key in ('brightness', 'sharpness', 'contrast', 'blockiness'):
+                if key in metrics:
+                    bucket[key].append(metrics[key])
+            for problem in analyzer.detect_problems(metrics):
+                bucket['issues'][problem] += 1
+
+    cap.release()
+    if bucket['frames']:
+        flush()
+
+    elapsed = time.time() - started
+    sharpness = [row['sharpness'] for row in rows if row['sharpness'] is not None]
+    contrast = [row['contrast'] for row in rows if row['contrast'] is not None]
+    summary = {
+        'file': path,
+        'frames': frames,
+        'seconds': len(rows),
+        'elapsed': elapsed,
+        'speed': (len(rows) / elapsed) if elapsed > 0 else 0.0,
+        'missing_frames': timing.missing_total,
+        'issues': len(issues),
+        'sharpness_p5_p50': (np.percentile(sharpness, [5, 50]).round(1).tolist() if sharpness else None),
+        'contrast_p5_p50': (np.percentile(contrast, [5, 50]).round(1).tolist() if contrast else None)
+    }
+    return rows, issues, summary
+
+
+def _analyze_task(args):
+    return analyze_file(*args)
+
+
+def _require_writer(path):
+    if path.lower().endswith('.parquet') and pd is None:
+        raise SystemExit("ERROR: для Parquet нужен pandas (pip install pandas pyarrow)")
+
+
+def write_table(rows, fields, path):
+    """CSV, либо Parquet по расширению .parquet (нужен pandas с pyarrow)"""
+    if path.lower().endswith('.parquet'):
+        pd.DataFrame(rows, columns=fields).to_parquet(path, index=False)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_batch(paths, mode, workers, metrics_path, issues_path, stride=1):
+    _require_writer(metrics_path)
+    _require_writer(issues_path)
+    files = collect_files(paths)
+    if not files:
+        print("ERROR: нет видеофайлов для анализа")
+        return
+    print(f"Анализ {len(files)} файлов ({mode} режим, процессов: {workers})")
+
+    all_rows = []
+    all_issues = []
+    started = time.time()
+    tasks = [(path, mode, stride) for path in files]
+    with multiprocessing.Pool(min(workers, len(files))) as pool:
+        for rows, issues, summary in pool.imap_unordered(_analyze_task, tasks):
+            all_rows.extend(rows)
+            all_issues.extend(issues)
+            if 'error' in summary:
+                print(f"ERROR: {summary['file']} - {summary['error']}")
+                continue
+            print(f"{summary['file']}: {summary['frames']} кадров, {summary['seconds']}с видео за "
+                  f"{summary['elapsed']:.1f}с (x{summary['speed']:.1f}) | пропущено кадров: "
+                  f"{summary['missing_frames']} | проблем: {summary['issues']}"
+                  + (f" | резкость p5/p50: {summary['sharpness_p5_p50']}" if summary['sharpness_p5_p50'] else "")
+                  + (f" | контраст p5/p50: {summary['contrast_p5_p50']}" if summary['contrast_p5_p50'] else ""))
+
+    all_rows.sort(key=lambda row: (row['file'], row['second']))
+    all_issues.sort(key=lambda row: (row['file'], row['second']))
+    write_table(all_rows, METRIC_FIELDS, metrics_path)
+    write_table(all_issues, ISSUE_FIELDS, issues_path)
+    print(f"Готово за {time.time() - started:.1f}с: метрики -> {metrics_path}, проблемы -> {issues_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетный анализ записанных видеофайлов")
+    parser.add_argument("paths", nargs="+", help="файлы или каталоги с записями")
+    parser.add_argument("--mode", choices=("basic", "advanced"), default="advanced",
+                        help="basic - битрейт, FPS и пропуски кадров, advanced - плюс качество изображения")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--stride", type=int, default=1, help="анализировать каждый N-й кадр")
+    parser.add_argument("--out", default="metrics.csv", help="метрики по секундам (.csv или .parquet)")
+    parser.add_argument("--issues", default="issues.csv", help="найденные проблемы (.csv или .parquet)")
+    args = parser.parse_args()
+
+    run_batch(args.paths, args.mode, args.workers, args.out, args.issues, max(1, args.stride))
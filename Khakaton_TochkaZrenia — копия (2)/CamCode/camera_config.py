@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from datetime import datetime
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camera_config.json')
+
+# Параметры, которые применяются к работающему монитору без переподключения
+LIVE_SETTINGS = ('window_size', 'threshold_ratio', 'check_interval', 'web_check_interval', 'sample_window')
+# Параметры, смена которых требует переподключения камеры (mode задает сервер воркерам,
+# sample_period переключает камеру между постоянным и выборочным мониторингом)
+RESTART_SETTINGS = ('rtsp_url', 'mode', 'sample_period')
+
+DEFAULTS = {
+    'window_size': 30,
+    'threshold_ratio': 0.3,
+    'check_interval': 10,  # Интервал проверки консольного монитора (index.py)
+    'web_check_interval': 2,  # Интервал проверки веб-монитора (server.py): живой статус в интерфейсе
+    'sample_period': 0,  # Выборочный мониторинг: окно раз в sample_period секунд (0 - постоянно)
+    'sample_window': 5,
+}
+
+
+def load_camera_config(path=CONFIG_PATH):
+    """
+    Чтение конфигурации камер -> {camera_id: настройки}.
+    Поддерживается старый формат (одна камера, поля на верхнем уровне) и список:
+    {"defaults": {...}, "cameras": [{"id": "cam_001", "rtsp_url": "...", ...}, ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    defaults = dict(DEFAULTS)
+    if 'cameras' not in data:
+        defaults.update(data)
+        cameras = [dict(defaults, id=data.get('id', 'cam_001'))]
+    else:
+        defaults.update(data.get('defaults', {}))
+        cameras = [dict(defaults, **camera) for camera in data['cameras']]
+
+    config = {}
+    for camera in cameras:
+        camera_id = camera.pop('id', None)
+        if not camera_id or not camera.get('rtsp_url'):
+            raise ValueError(f"У камеры должны быть 'id' и 'rtsp_url': {camera}")
+        if camera_id in config:
+            raise ValueError(f"Повторяющийся id камеры: {camera_id}")
+        config[camera_id] = camera
+    return config
+
+
+def diff_configs(old, new):
+    """
+    Разница конфигураций: (добавленные, удаленные, перезапуск, изменения на лету).
+    Изменения на лету - {camera_id: {параметр: новое значение}}.
+    """
+    added = [camera_id for camera_id in new if camera_id not in old]
+    removed = [camera_id for camera_id in old if camera_id not in new]
+    restarted = []
+    updated = {}
+    for camera_id in new:
+        if camera_id not in old:
+            continue
+        before, after = old[camera_id], new[camera_id]
+        if any(before.get(key) != after.get(key) for key in RESTART_SETTINGS):
+            restarted.append(camera_id)
+            continue
+        changes = {key: after[key] for key in LIVE_SETTINGS if before.get(key) != after.get(key)}
+        if changes:
+            updated[camera_id] = changes
+    return added, removed, restarted, updated
+
+
+class ConfigWatcher:
+    """
+    Отслеживание camera_config.json: при изменении файла запускает только новые камеры,
+    останавливает удаленные и меняет пороги работающих мониторов на месте.
+    """
+
+    def __init__(self, path, on_added, on_removed, on_updated, poll_interval=2.0, sleep=time.sleep):
+        self.path = path
+        self.on_added = on_added  # (camera_id, настройки)
+        self.on_removed = on_removed  # (camera_id)
+        self.on_updated = on_updated  # (camera_id, изменения)
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self.config = {}
+        self._mtime = None
+        self._running = False
+
+    def load_initial(self):
+        """Первичная загрузка; возвращает конфигурацию"""
+        self._mtime = self._current_mtime()
+        self.config = load_camera_config(self.path)
+        return self.config
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self):
+        """Проверка файла; возвращает True, если конфигурация применена"""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            new_config = load_camera_config(self.path)
+        except (OSError, ValueError) as e:
+            # Файл может быть сохранен наполовину - оставляем прежнюю конфигурацию
+            print(f"[CONFIG_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+            return False
+
+        added, removed, restarted, updated = diff_configs(self.config, new_config)
+        self.config = new_config
+        for camera_id in removed + restarted:
+            self.on_removed(camera_id)
+        for camera_id in added + restarted:
+            self.on_added(camera_id, new_config[camera_id])
+        for camera_id, changes in updated.items():
+            self.on_updated(camera_id, changes)
+        if added or removed or restarted or updated:
+            print(f"[CONFIG] {datetime.now().strftime('%H:%M:%S')} - Конфигурация обновлена: "
+                  f"+{len(added)} -{len(removed)} перезапуск {len(restarted)} пороги {len(updated)}")
+        return True
+
+    def run(self):
+        """Цикл отслеживания (для отдельного потока)"""
+        self._running = True
+        while self._running:
+            self.check()
+            self.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
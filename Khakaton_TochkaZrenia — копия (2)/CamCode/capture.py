@@ -0,0 +1,163 @@
+import os
+import threading
+
+import cv2
+
+from frame_bus import FrameBusCapture
+
+# Источник framebus://<camera_id> - кадры из шины в разделяемой памяти (frame_bus.py)
+FRAME_BUS_SCHEME = "framebus://"
+# Сетевые источники: OpenCV (FFmpeg) прерывает подключение и чтение по таймаутам
+NETWORK_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+
+OPEN_TIMEOUT_MSEC = int(os.environ.get('CAPTURE_OPEN_TIMEOUT_MS', '10000'))
+READ_TIMEOUT_MSEC = int(os.environ.get('CAPTURE_READ_TIMEOUT_MS', '5000'))
+
+
+def open_capture(url, open_timeout_ms=OPEN_TIMEOUT_MSEC, read_timeout_ms=READ_TIMEOUT_MSEC):
+    """
+    Открытие источника кадров: RTSP/HTTP/файл через OpenCV или шина кадров.
+    Сетевые потоки открываются с таймаутами подключения и чтения: read() на мертвом
+    сокете возвращает False через read_timeout_ms, а не висит бесконечно.
+    """
+    if url.startswith(FRAME_BUS_SCHEME):
+        return FrameBusCapture(url[len(FRAME_BUS_SCHEME):], timeout=read_timeout_ms / 1000.0)
+    if url.lower().startswith(NETWORK_SCHEMES):
+        return cv2.VideoCapture(url, cv2.CAP_ANY, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout_ms,
+                                                   cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout_ms])
+    return cv2.VideoCapture(url)
+
+
+def is_network_source(url):
+    """Есть ли у источника сетевой хост, который имеет смысл пинговать"""
+    return not url.startswith(FRAME_BUS_SCHEME)
+
+
+class CaptureCancelled(Exception):
+    """Мониторинг камеры остановлен во время ожидания"""
+
+
+class CaptureTimeout(Exception):
+    """Блокирующий вызов захвата не вернулся за отведенное время"""
+
+
+class CancelToken:
+    """
+    Отмена работы одного монитора: прерывает паузы (wait) и ожидание вызовов захвата.
+    Под eventlet.monkey_patch событие зеленое - cancel() вызывается из green-задач.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        if self._event.is_set():
+            return
+        self._event.set()
+        for callback in list(self._callbacks):
+            callback()
+
+    def wait(self, seconds):
+        """Пауза, прерываемая отменой; True - токен отменен"""
+        return self._event.wait(seconds)
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+        if self._event.is_set():
+            callback()
+
+    def remove_callback(self, callback):
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+
+class CaptureWatchdog:
+    """
+    Сторож захвата одной камеры: открытие и чтение выполняются в потоке ОС (run_blocking),
+    а монитор ждет не дольше дедлайна и сразу выходит при отмене токена.
+    Зависший вызов бросается (CaptureTimeout/CaptureCancelled), а его capture закрывается
+    тем потоком, в котором висит вызов, когда тот вернется: release параллельно с read небезопасен.
+    """
+
+    def __init__(self, token, run_blocking, spawn, read_timeout=READ_TIMEOUT_MSEC / 1000.0 + 2.0,
+                 open_timeout=OPEN_TIMEOUT_MSEC / 1000.0 + 2.0):
+        self.token = token
+        self.run_blocking = run_blocking
+        self.spawn = spawn
+        self.read_timeout = read_timeout
+        self.open_timeout = open_timeout
+        self.abandoned = 0  # Брошенных вызовов за время работы монитора
+        self._pending = set()  # id(cap) с брошенным, но еще не вернувшимся чтением
+
+    def call(self, timeout, on_abandoned, fn, *args):
+        """
+        fn(*args) в потоке ОС с ожиданием не дольше timeout.
+        on_abandoned(результат или None) вызывается, если вызов вернулся после того, как его бросили.
+        """
+        if self.token.cancelled:
+            raise CaptureCancelled()
+        done = threading.Event()
+        lock = threading.Lock()
+        state = {}
+
+        def run():
+            try:
+                outcome = (True, self.run_blocking(fn, *args))
+            except Exception as e:
+                outcome = (False, e)
+            with lock:
+                if not state.get('abandoned'):
+                    state['outcome'] = outcome
+                    done.set()
+                    return
+            on_abandoned(outcome[1] if outcome[0] else None)
+
+        self.token.add_callback(done.set)
+        self.spawn(run)
+        try:
+            done.wait(timeout)
+        finally:
+            self.token.remove_callback(done.set)
+        with lock:
+            outcome = state.get('outcome')
+            if outcome is None:
+                state['abandoned'] = True
+        if outcome is not None:
+            ok, value = outcome
+            if ok:
+                return value
+            raise value
+        self.abandoned += 1
+        if self.token.cancelled:
+            raise CaptureCancelled()
+        raise CaptureTimeout(f"{getattr(fn, '__name__', 'вызов')} дольше {timeout:g}с")
+
+    def open(self, url):
+        return self.call(self.open_timeout, lambda cap: cap is not None and cap.release(), open_capture, url)
+
+    def read(self, cap, image=None):
+        if self.token.cancelled:
+            raise CaptureCancelled()
+        try:
+            return self.call(self.read_timeout, lambda result: self._release_abandoned(cap), cap.read, image)
+        except (CaptureTimeout, CaptureCancelled):
+            # Чтение еще висит в потоке ОС: capture закроет _release_abandoned
+            self._pending.add(id(cap))
+            raise
+
+    def _release_abandoned(self, cap):
+        self._pending.discard(id(cap))
+        cap.release()
+
+    def release(self, cap):
+        """Закрытие capture монитором; если чтение брошено и еще висит - его закроет поток чтения"""
+        if cap is None or id(cap) in self._pending:
+            return
+        cap.release()
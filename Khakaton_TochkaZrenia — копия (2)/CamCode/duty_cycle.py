@@ -0,0 +1,99 @@
+import time
+import zlib
+from collections import Counter
+
+from capture import open_capture
+from frame_timing import FrameTiming
+
+# Выборочный мониторинг: камера не держит RTSP-сессию постоянно, а раз в период
+# подключается, читает окно в несколько секунд, проверяет его и отключается.
+# Старты окон разнесены по периоду (сдвиг от camera_id), поэтому одновременно
+# читается около N * окно / период потоков, а не все N.
+
+# Доля проанализированных кадров окна, с которой проблема качества попадает в вердикт окна
+PERSISTENT_SHARE = 0.5
+QUALITY_KEYS = ('brightness', 'sharpness', 'contrast', 'blockiness')
+
+
+def stagger_offset(camera_id, period_sec):
+    """Сдвиг первого окна камеры внутри периода: постоянный для camera_id, равномерный по парку"""
+    return zlib.crc32(camera_id.encode('utf-8')) % 1000 / 1000.0 * period_sec
+
+
+def next_window_time(scheduled, period_sec, now):
+    """Следующее окно по расписанию; опоздавшие окна пропускаются без серии догоняющих"""
+    scheduled += period_sec
+    if scheduled <= now:
+        scheduled += (int((now - scheduled) // period_sec) + 1) * period_sec
+    return scheduled
+
+
+def sample_window(url, window_sec, analyzer=None, timing=None, should_stop=None, opener=open_capture):
+    """
+    Одно окно выборки: подключение, чтение кадров window_sec секунд, проверки, отключение.
+    analyzer - QualityAnalyzer камеры (advanced режим), его базовые уровни переживают окна.
+    should_stop - функция без аргументов, True прерывает окно (остановка мониторинга).
+    Возвращает сводку окна; connected=False, если поток не открылся или не дал кадров.
+    """
+    timing = timing or FrameTiming()
+    # FPS, джиттер и пропуски - только по кадрам этого окна
+    timing.start_window()
+    missing_before = timing.missing_total
+    started = time.time()
+    summary = {'time': started, 'window': window_sec, 'connected': False, 'frames': 0}
+    cap = opener(url)
+    try:
+        if not cap.isOpened():
+            return summary
+        summary['connectMs'] = round((time.time() - started) * 1000.0, 1)
+
+        frame = None
+        resolution = None
+        frames = 0
+        analyzed = 0
+        bitrate_total = 0
+        quality = {key: [] for key in QUALITY_KEYS}
+        issues = Counter()
+        stream_lost = False
+        read_started = time.time()
+        while time.time() - read_started < window_sec:
+            if should_stop is not None and should_stop():
+                break
+            ret, frame = cap.read(frame)
+            if not ret:
+                stream_lost = True
+                break
+            frames += 1
+            resolution = frame.shape[:2]
+            bitrate_total += len(frame) * 8
+            timing.on_frame(cap, time.time())
+            if analyzer is not None:
+                metrics = analyzer.analyze(frame)
+                analyzed += 1
+                for key in QUALITY_KEYS:
+                    if key in metrics:
+                        quality[key].append(float(metrics[key]))
+                for problem in analyzer.detect_problems(metrics):
+                    issues[problem] += 1
+    finally:
+        cap.release()
+
+    if not frames:
+        return summary
+    summary.update({
+        'connected': True,
+        'frames': frames,
+        'seconds': round(time.time() - read_started, 2),
+        'fps': round(timing.fps(), 2),
+        'jitterMs': round(timing.jitter_ms(), 2),
+        'missingFrames': timing.missing_total - missing_before,
+        'bitrate': bitrate_total / frames,
+        'resolution': list(resolution),
+        'streamLost': stream_lost,
+        'issues': dict(issues),
+        # Единичные кадры с проблемой в окне - шум; вердикт - по устойчивым проблемам
+        'problems': [problem for problem, count in issues.items() if count >= analyzed * PERSISTENT_SHARE]
+    })
+    if analyzed:
+        summary['quality'] = {key: round(sum(values) / len(values), 2) for key, values in quality.items() if values}
+    return summary
@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+# Писатель должен быть настоящим потоком ОС и под eventlet.monkey_patch (server.py)
+if 'eventlet' in sys.modules:
+    from eventlet.patcher import original
+    threading = original('threading')
+    queue = original('queue')
+else:
+    import queue
+    import threading
+
+EVENT_DB_PATH = os.environ.get(
+    'EVENT_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events.db'))
+
+# События мониторинга (алерты, проблемы изображения, потери потока, переподключения, ping)
+# в SQLite: выборки по камере или типу за период идут по индексу, а не полным чтением log.txt.
+# Счетчики по часам (event_counts) пополняются в той же транзакции, что и события,
+# поэтому сводка по камерам за неделю не перебирает сами события.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    camera_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    level TEXT NOT NULL,
+    detail TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_camera_time ON events (camera_id, time);
+CREATE INDEX IF NOT EXISTS events_type_time ON events (type, time);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE TABLE IF NOT EXISTS event_counts (
+    hour INTEGER NOT NULL,
+    camera_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    detail TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (hour, camera_id, type, detail)
+) WITHOUT ROWID;
+"""
+
+INSERT_EVENTS = "INSERT INTO events (time, camera_id, type, level, detail, message) VALUES (?, ?, ?, ?, ?, ?)"
+UPSERT_COUNTS = """
+INSERT INTO event_counts (hour, camera_id, type, detail, count, last) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (hour, camera_id, type, detail)
+DO UPDATE SET count = count + excluded.count, last = max(last, excluded.last)
+"""
+
+MAX_PAGE = 1000
+
+
+def parse_time(value):
+    """Время из запроса: секунды Unix или ISO 8601; None - не задано"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _row(row):
+    event_id, timestamp, camera_id, event_type, level, detail, message = row
+    return {
+        'id': event_id,
+        'ts': timestamp,
+        'time': datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+        'cameraId': camera_id,
+        'type': event_type,
+        'level': level,
+        'detail': detail,
+        'message': message
+    }
+
+
+class EventStore:
+    """
+    Хранилище событий: add() только кладет событие в очередь, запись - пачками
+    в фоновом потоке (одна транзакция на пачку). Чтение - отдельными соединениями (WAL),
+    запись ему не мешает.
+    """
+
+    def __init__(self, path=EVENT_DB_PATH, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Наибольшая задержка записи события
+        self.queue = queue.Queue()
+        self.enabled = True
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def add(self, camera_id, event_type, level, message, detail=None, timestamp=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="event-writer", daemon=True)
+                self._thread.start()
+        self.queue.put((timestamp or time.time(), camera_id or '--', event_type, level, detail, message))
+
+    def _loop(self):
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            print(f"[EVENT_STORE_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+            self.enabled = False
+            return
+        while True:
+            batch = [self.queue.get()]
+            # Добор пачки: события, пришедшие за flush_interval, пишутся одной транзакцией
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            counts = {}
+            for timestamp, camera_id, event_type, _, detail, _ in batch:
+                key = (int(timestamp // 3600), camera_id, event_type, detail or '')
+                count, last = counts.get(key, (0, timestamp))
+                counts[key] = (count + 1, max(last, timestamp))
+            try:
+                with connection:
+                    connection.executemany(INSERT_EVENTS, batch)
+                    connection.executemany(UPSERT_COUNTS, [key + value for key, value in counts.items()])
+            except sqlite3.Error as e:
+                self.dropped += len(batch)
+                print(f"[EVENT_STORE_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e} (потеряно событий: {len(batch)})")
+
+    def query(self, camera_id=None, event_type=None, since=None, until=None, limit=100, before=None):
+        """
+        Страница событий от новых к старым.
+        before - курсор "time:id" последнего события прошлой страницы (keyset-пагинация:
+        страница читается по индексу, без OFFSET). Возвращает (события, курсор следующей страницы).
+        """
+        limit = max(1, min(int(limit), MAX_PAGE))
+        where, params = self._filters(camera_id, event_type, since, until)
+        if before:
+            before_time, before_id = before.split(':', 1)
+            where.append("(time < ? OR (time = ? AND id < ?))")
+            params += [float(before_time), float(before_time), int(before_id)]
+        sql = "SELECT id, time, camera_id, type, level, detail, message FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY time DESC, id DESC LIMIT ?"
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, params + [limit + 1]).fetchall()
+        finally:
+            connection.close()
+        events = [_row(row) for row in rows[:limit]]
+        cursor = f"{events[-1]['ts']!r}:{events[-1]['id']}" if len(rows) > limit else None
+        return events, cursor
+
+    def aggregate(self, camera_id=None, event_type=None, since=None, until=None):
+        """
+        Число событий по камерам из часовых счетчиков (since/until - с точностью до часа):
+        [{'cameraId', 'total', 'last', 'types': {тип: {деталь: число}}}], камеры с большим числом событий первыми.
+        """
+        where, params = self._filters(camera_id, event_type, None, None)
+        if since is not None:
+            where.append("hour >= ?")
+            params.append(int(since // 3600))
+        if until is not None:
+            where.append("hour < ?")
+            params.append(-int(-until // 3600))
+        sql = "SELECT camera_id, type, detail, SUM(count), MAX(last) FROM event_counts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY camera_id, type, detail"
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+        cameras = {}
+        for camera, event_type, detail, count, last in rows:
+            entry = cameras.setdefault(camera, {'cameraId': camera, 'total': 0, 'last': last, 'types': {}})
+            entry['total'] += count
+            entry['last'] = max(entry['last'], last)
+            entry['types'].setdefault(event_type, {})[detail] = count
+        for entry in cameras.values():
+            entry['last'] = datetime.fromtimestamp(entry['last']).isoformat(timespec='seconds')
+        return sorted(cameras.values(), key=lambda entry: -entry['total'])
+
+    @staticmethod
+    def _filters(camera_id, event_type, since, until):
+        where, params = [], []
+        if camera_id:
+            where.append("camera_id = ?")
+            params.append(camera_id)
+        if event_type:
+            where.append("type = ?")
+            params.append(event_type)
+        if since is not None:
+            where.append("time >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("time < ?")
+            params.append(until)
+        return where, params
+
+
+event_store = EventStore()
@@ -0,0 +1,316 @@
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+# Шина кадров камеры в разделяемой памяти: один процесс декодирует поток,
+# любое число процессов-анализаторов читает кадры без копирования.
+#
+# Раскладка сегмента "framebus_<camera_id>":
+#   заголовок int64[8]: magic, slots, height, width, channels, latest_seq, closed, reserved
+#   seqlock слотов int64[slots]: 2*seq - кадр записан, 2*seq+1 - идет запись
+#   время кадров float64[slots]
+#   кадры uint8[slots, height, width, channels]
+MAGIC = 0x46424B31
+HEADER_LEN = 8
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_LATEST, H_CLOSED = range(7)
+
+
+def segment_name(camera_id):
+    return f"framebus_{camera_id}"
+
+
+def _tracker_name(name):
+    """Имя сегмента, под которым SharedMemory регистрирует его в resource_tracker (POSIX - с "/")"""
+    return f"/{name}" if os.name == 'posix' else name
+
+
+def _layout(slots, shape):
+    height, width, channels = shape
+    header_bytes = HEADER_LEN * 8
+    seq_bytes = slots * 8
+    ts_bytes = slots * 8
+    frame_bytes = slots * height * width * channels
+    return header_bytes, seq_bytes, ts_bytes, frame_bytes
+
+
+class _FrameBusBase:
+    def _map(self, slots, shape):
+        header_bytes, seq_bytes, ts_bytes, frame_bytes = _layout(slots, shape)
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=buf, offset=0)
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=header_bytes)
+        self.slot_time = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=header_bytes + seq_bytes)
+        self.frames = np.ndarray((slots,) + tuple(shape), dtype=np.uint8, buffer=buf,
+                                 offset=header_bytes + seq_bytes + ts_bytes)
+        self.slots = slots
+        self.shape = tuple(shape)
+
+    def _unmap(self):
+        # Освобождаем numpy-представления до закрытия сегмента
+        self.header = self.slot_seq = self.slot_time = self.frames = None
+
+
+class FrameBusWriter(_FrameBusBase):
+    """Запись декодированных кадров камеры в кольцо слотов"""
+
+    def __init__(self, camera_id, shape, slots=8):
+        self.camera_id = camera_id
+        size = sum(_layout(slots, shape))
+        try:
+            self.shm = shared_memory.SharedMemory(name=segment_name(camera_id), create=True, size=size)
+        except FileExistsError:
+            # Остался сегмент от упавшего декодера - пересоздаем
+            stale = shared_memory.SharedMemory(name=segment_name(camera_id))
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=segment_name(camera_id), create=True, size=size)
+        self._map(slots, shape)
+        self.header[:] = 0
+        self.slot_seq[:] = -1
+        self.header[H_SLOTS] = slots
+        self.header[H_HEIGHT], self.header[H_WIDTH], self.header[H_CHANNELS] = shape
+        self.header[H_MAGIC] = MAGIC
+        self.sequence = 0
+
+    def write(self, frame, timestamp=None):
+        """Запись кадра; возвращает его номер"""
+        seq = self.sequence + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = 2 * seq + 1
+        if frame.shape == self.shape:
+            np.copyto(self.frames[slot], frame)
+        else:
+            # Камера сменила разрешение - приводим к размеру шины
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self.frames[slot])
+        self.slot_time[slot] = timestamp if timestamp is not None else time.time()
+        self.slot_seq[slot] = 2 * seq
+        self.header[H_LATEST] = seq
+        self.sequence = seq
+        return seq
+
+    def close(self):
+        """Закрытие шины: читатели получат конец потока"""
+        self.header[H_CLOSED] = 1
+        self._unmap()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameBusReader(_FrameBusBase):
+    """Чтение кадров камеры из шины без копирования"""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        name = segment_name(camera_id)
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Сегментом владеет декодер: трекер читателя не должен удалять его при выходе
+        try:
+            resource_tracker.unregister(_tracker_name(name), 'shared_memory')
+        except Exception:
+            pass
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=self.shm.buf)
+        if header[H_MAGIC] != MAGIC:
+            self.shm.close()
+            raise RuntimeError(f"Шина кадров {camera_id} не инициализирована")
+        shape = (int(header[H_HEIGHT]), int(header[H_WIDTH]), int(header[H_CHANNELS]))
+        slots = int(header[H_SLOTS])
+        del header
+        self._map(slots, shape)
+
+    @property
+    def closed(self):
+        return bool(self.header[H_CLOSED])
+
+    def latest_sequence(self):
+        return int(self.header[H_LATEST])
+
+    def get(self, seq):
+        """
+        Кадр с номером seq: (frame, timestamp) или None, если он уже перезаписан.
+        frame - представление слота без копирования, валидно пока is_valid(seq).
+        """
+        slot = seq % self.slots
+        if self.slot_seq[slot] != 2 * seq:
+            return None
+        frame = self.frames[slot]
+        timestamp = float(self.slot_time[slot])
+        if self.slot_seq[slot] != 2 * seq:
+            return None
+        return frame, timestamp
+
+    def is_valid(self, seq):
+        """Слот кадра seq еще не перезаписан"""
+        return self.slot_seq[seq % self.slots] == 2 * seq
+
+    def wait_next(self, last_seq, timeout=5.0, poll_interval=0.002):
+        """Ожидание кадра новее last_seq -> (seq, frame, timestamp) или None"""
+        deadline = time.time() + timeout
+        while time.time() < deadline and not self.closed:
+            seq = self.latest_sequence()
+            if seq > last_seq:
+                item = self.get(seq)
+                if item is not None:
+                    return (seq,) + item
+            time.sleep(poll_interval)
+        return None
+
+    def close(self):
+        self._unmap()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Снаружи еще живут представления кадров - отображение освободится вместе с ними
+            pass
+
+
+class FrameBusCapture:
+    """Чтение шины с интерфейсом cv2.VideoCapture (isOpened/read/release) для мониторов"""
+
+    def __init__(self, camera_id, timeout=5.0):
+        self.timeout = timeout
+        self.last_seq = 0
+        self.last_timestamp = 0.0
+        try:
+            self.reader = FrameBusReader(camera_id)
+            self.last_seq = self.reader.latest_sequence() - 1
+        except (FileNotFoundError, RuntimeError):
+            self.reader = None
+
+    def isOpened(self):
+        return self.reader is not None and not self.reader.closed
+
+    def read(self, image=None):
+        """
+        Копия кадра в буфер image (как cv2.VideoCapture.read). Представление слота потребителям
+        не отдается: декодер перезаписывает слот через slots/fps секунд. Копия проверяется по
+        номеру слота после копирования; если слот перезаписан во время копирования - берется следующий кадр.
+        """
+        if not self.isOpened():
+            return False, None
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = deadline - time.time()
+            item = self.reader.wait_next(self.last_seq, remaining) if remaining > 0 else None
+            if item is None:
+                return False, None
+            seq, frame, timestamp = item
+            if image is None or image.shape != frame.shape:
+                image = np.empty_like(frame)
+            np.copyto(image, frame)
+            if self.reader.is_valid(seq):
+                self.last_seq, self.last_timestamp = seq, timestamp
+                return True, image
+
+    def get(self, prop):
+        # Метка кадра - время его декодирования в процессе-декодере
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.last_timestamp * 1000.0
+        return 0.0
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def run_decoder(camera_id, rtsp_url, slots=8):
+    """Единственный декодер камеры: поток -> шина кадров"""
+    writer = None
+    cap = cv2.VideoCapture(rtsp_url)
+    print(f"[{camera_id}] Декодер шины кадров запущен")
+    frame = None
+    try:
+        while True:
+            ret, frame = cap.read(frame)  # Кадр копируется в слот шины, буфер переиспользуется
+            if not ret:
+                print(f"[{camera_id}] WARNING: {datetime.now().strftime('%H:%M:%S')} - Потерян видеопоток, переподключение")
+                cap.release()
+                time.sleep(5)
+                cap = cv2.VideoCapture(rtsp_url)
+                continue
+            if writer is None:
+                writer = FrameBusWriter(camera_id, frame.shape, slots)
+                print(f"[{camera_id}] INFO: Шина {segment_name(camera_id)}: {frame.shape[1]}x{frame.shape[0]}, {slots} слотов")
+            writer.write(frame)
+    except KeyboardInterrupt:
+        print(f"\n[{camera_id}] INFO: Декодер остановлен пользователем")
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.close()
+
+
+def _analyzer_worker(camera_id, worker_index, workers):
+    """Процесс-анализатор: берет каждый workers-й кадр шины"""
+    from image_quality import QualityAnalyzer
+
+    reader = FrameBusReader(camera_id)
+    # Заморозку можно отследить только по подряд идущим кадрам
+    analyzer = QualityAnalyzer(camera_id, detect_freeze=False)
+    last_seq = 0
+    analyzed = 0
+    last_report = time.time()
+    try:
+        while not reader.closed:
+            item = reader.wait_next(last_seq)
+            if item is None:
+                continue
+            seq, frame, _ = item
+            last_seq = seq
+            if seq % workers != worker_index:
+                continue
+            metrics = analyzer.analyze(frame)
+            if not reader.is_valid(seq):
+                # Слот перезаписан во время анализа - результат недостоверен
+                continue
+            analyzed += 1
+            problems = analyzer.detect_problems(metrics)
+            now = time.time()
+            if now - last_report >= 5:
+                status = ', '.join(problems) if problems else "NORMAL"
+                print(f"[{camera_id}/{worker_index}] STATUS: {datetime.now().strftime('%H:%M:%S')} - "
+                      f"кадров: {analyzed} ({analyzed / (now - last_report):.1f}/с) | "
+                      f"Резкость: {metrics.get('sharpness', 0):.1f} | {status}")
+                analyzed = 0
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+def run_analyzers(camera_id, workers):
+    """Запуск workers процессов-анализаторов одной шины"""
+    processes = [multiprocessing.Process(target=_analyzer_worker, args=(camera_id, i, workers))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print(f"\n[{camera_id}] INFO: Анализаторы остановлены пользователем")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Шина декодированных кадров в разделяемой памяти")
+    sub = parser.add_subparsers(dest="command", required=True)
+    decode = sub.add_parser("decode", help="декодировать поток камеры в шину")
+    decode.add_argument("camera_id")
+    decode.add_argument("url")
+    decode.add_argument("--slots", type=int, default=8)
+    analyze = sub.add_parser("analyze", help="анализ кадров шины в нескольких процессах")
+    analyze.add_argument("camera_id")
+    analyze.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    if args.command == "decode":
+        run_decoder(args.camera_id, args.url, args.slots)
+    else:
+        run_analyzers(args.camera_id, args.workers)
@@ -0,0 +1,156 @@
+import collections
+
+import cv2
+import numpy as np
+
+from quantiles import StreamingQuantiles
+
+# Границы корзин гистограммы межкадровых интервалов, мс
+GAP_BUCKETS_MS = (20, 30, 40, 50, 70, 100, 150, 250, 500, 1000)
+# Сверка меток со временем получения: за окно PTS_CHECK_MS метки должны пройти
+# от 0.5 до 2 прошедшего времени. Иначе метки придуманы демультиплексором
+# (MJPEG по HTTP в FFmpeg - всегда 25 кадров/с) и используется время получения.
+PTS_CHECK_MS = 3000.0
+PTS_RATIO_RANGE = (0.5, 2.0)
+
+
+class FrameTiming:
+    """
+    FPS и джиттер потока по временным меткам кадров (CAP_PROP_POS_MSEC),
+    а не по скорости цикла Python: задержки анализа и time.sleep не влияют на результат.
+    Если источник не отдает метки (0 или не растут) или они расходятся со временем получения,
+    используется время получения кадра.
+    """
+
+    def __init__(self, window=100, missing_factor=1.5):
+        self.window = window
+        self.missing_factor = missing_factor  # Интервал больше N номинальных - пропуск кадров
+        self.gaps = collections.deque(maxlen=window)  # мс, фактический интервал перед каждым кадром
+        self.missing = collections.deque(maxlen=window)  # пропущено кадров перед каждым кадром
+        self.missing_total = 0
+        self.nominal_ms = None  # Номинальный интервал из CAP_PROP_FPS
+        self.source = 'pts'
+        self.last_ts = None
+        self.pts_anchor = None  # (метка, время получения) начала окна сверки
+        # Квантили за все время работы монитора (окно gaps - только последние кадры)
+        self.gap_quantiles = StreamingQuantiles()
+        self.fps_quantiles = StreamingQuantiles((0.01, 0.05, 0.5, 0.95, 0.99))
+
+    def reset(self):
+        """Переподключение: метки нового потока начинаются заново"""
+        self.last_ts = None
+        self.pts_anchor = None
+
+    def start_window(self):
+        """
+        Новое окно выборки (duty_cycle.py): окно интервалов и пропусков начинается с нуля,
+        квантили и missing_total за все время работы сохраняются.
+        """
+        self.reset()
+        self.gaps.clear()
+        self.missing.clear()
+
+    def _timestamp(self, cap, arrival_time):
+        get = getattr(cap, 'get', None)
+        if self.nominal_ms is None and get is not None:
+            stream_fps = get(cv2.CAP_PROP_FPS)
+            # Часть источников отдает 0 или условные 90000/1000
+            self.nominal_ms = 1000.0 / stream_fps if 1 <= stream_fps <= 240 else 0.0
+        if self.source == 'pts' and get is not None:
+            pts = get(cv2.CAP_PROP_POS_MSEC)
+            if pts > 0 and not self._pts_diverged(pts, arrival_time):
+                return pts
+            if pts > 0:
+                # Номинальный FPS такого источника тоже условный, интервалы окна - по ложным меткам
+                self.source = 'wall'
+                self.last_ts = None
+                self.nominal_ms = 0.0
+                self.gaps.clear()
+                self.missing.clear()
+            elif self.last_ts is not None:
+                # Метки не растут - источник их не поддерживает
+                self.source = 'wall'
+                self.last_ts = None
+        else:
+            self.source = 'wall'
+        return arrival_time * 1000.0
+
+    def _pts_diverged(self, pts, arrival_time):
+        """Метки за окно сверки прошли не столько, сколько прошло времени получения"""
+        if self.pts_anchor is None:
+            self.pts_anchor = (pts, arrival_time)
+            return False
+        wall_ms = (arrival_time - self.pts_anchor[1]) * 1000.0
+        if wall_ms < PTS_CHECK_MS:
+            return False
+        ratio = (pts - self.pts_anchor[0]) / wall_ms
+        self.pts_anchor = (pts, arrival_time)
+        return not PTS_RATIO_RANGE[0] <= ratio <= PTS_RATIO_RANGE[1]
+
+    def _expected_gap(self):
+        if self.nominal_ms:
+            return self.nominal_ms
+        if len(self.gaps) >= 5:
+            return float(np.median(self.gaps))
+        return None
+
+    def on_frame(self, cap, arrival_time, skipped=0):
+        """
+        Учет прочитанного кадра. skipped - кадры, намеренно пропущенные перед ним
+        (grab без анализа); они не считаются потерянными.
+        Возвращает мгновенный FPS доставки (потерянные кадры его снижают) или None для первого кадра.
+        """
+        ts = self._timestamp(cap, arrival_time)
+        last_ts, self.last_ts = self.last_ts, ts
+        if last_ts is None or ts <= last_ts:
+            return None
+
+        # Интервал не делится на потерянные кадры: гистограмма и джиттер видят реальную паузу
+        gap = (ts - last_ts) / (skipped + 1)
+        lost = 0
+        expected = self._expected_gap()
+        if expected and gap > expected * self.missing_factor:
+            lost = int(round(gap / expected)) - 1
+        self.gaps.append(gap)
+        self.missing.append(lost)
+        self.missing_total += lost
+        delivery_fps = 1000.0 / gap
+        self.gap_quantiles.add(gap)
+        self.fps_quantiles.add(delivery_fps)
+        return delivery_fps
+
+    def fps(self):
+        """FPS потока за окно с учетом пропущенных кадров"""
+        if not self.gaps:
+            return 0.0
+        span = sum(self.gaps)
+        return 1000.0 * len(self.gaps) / span if span > 0 else 0.0
+
+    def jitter_ms(self):
+        """Джиттер: стандартное отклонение межкадрового интервала"""
+        return float(np.std(self.gaps)) if len(self.gaps) > 1 else 0.0
+
+    def gap_tail_ms(self):
+        """p99 межкадрового интервала с запуска (0, пока кадров нет)"""
+        summary = self.gap_quantiles.summary()
+        return summary['p99'] if summary else 0.0
+
+    def histogram(self):
+        """Гистограмма межкадровых интервалов окна: {'<=20': n, ..., '>1000': n}"""
+        counts = np.bincount(np.searchsorted(GAP_BUCKETS_MS, list(self.gaps), side='left'),
+                             minlength=len(GAP_BUCKETS_MS) + 1) if self.gaps else [0] * (len(GAP_BUCKETS_MS) + 1)
+        labels = [f"<={b}" for b in GAP_BUCKETS_MS] + [f">{GAP_BUCKETS_MS[-1]}"]
+        return {label: int(count) for label, count in zip(labels, counts)}
+
+    def summary(self):
+        return {
+            'fps': round(self.fps(), 2),
+            'jitterMs': round(self.jitter_ms(), 2),
+            'missingFrames': int(sum(self.missing)),
+            'missingTotal': self.missing_total,
+            'gapHistogram': self.histogram(),
+            # p1/p5 FPS - провалы, p95/p99 интервала - задержки кадров
+            'fpsQuantiles': self.fps_quantiles.summary(2),
+            'gapQuantilesMs': self.gap_quantiles.summary(),
+            'source': self.source
+        }
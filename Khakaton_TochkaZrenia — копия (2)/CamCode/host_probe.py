@@ -0,0 +1,147 @@
+import ipaddress
+import platform
+import subprocess
+import threading
+import time
+
+from capture import is_network_source
+
+
+def extract_host(url):
+    """Извлечение host из RTSP URL"""
+    if not is_network_source(url):
+        return None
+    try:
+        if '@' in url:
+            host_part = url.split('@')[1]
+        else:
+            host_part = url.split('//')[1]
+        return host_part.split(':')[0].split('/')[0]
+    except Exception:
+        return None
+
+
+def ping_host(host):
+    """Один ICMP-пинг хоста"""
+    param = "-n" if platform.system().lower() == "windows" else "-c"
+    command = ["ping", param, "1", host]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=5)
+        return "success" if result.returncode == 0 else "failed"
+    except Exception:
+        return "error"
+
+
+class _HostState:
+    def __init__(self):
+        self.last_probe_time = 0.0
+        self.last_result = None
+        self.in_flight = None  # threading.Event текущего пинга
+        self.incident_started = None
+        self.incident_cameras = set()
+        self.affected_total = set()
+
+
+class HostProbeCoordinator:
+    """
+    Общие пинги и корреляция потерь потока по хосту (NVR) или подсети.
+    Камеры одного хоста получают результат одного пинга, а одновременные
+    потери потока сводятся в один инцидент вместо N строк CRITICAL.
+    """
+
+    def __init__(self, cooldown_sec=60.0, group_by='host', ping_func=ping_host):
+        self.cooldown_sec = cooldown_sec
+        self.group_by = group_by  # 'host' или 'subnet' (/24)
+        self.ping_func = ping_func
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def incident_key(self, host):
+        """Ключ корреляции: хост или его подсеть /24"""
+        if self.group_by == 'subnet':
+            try:
+                return str(ipaddress.ip_network(f"{host}/24", strict=False))
+            except ValueError:
+                pass
+        return host
+
+    def _state(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HostState()
+            return state
+
+    def probe(self, camera_id, host, stream_lost=False):
+        """
+        Пинг хоста камеры не чаще раза в cooldown_sec на хост.
+        stream_lost=True - камера потеряла поток и входит в инцидент хоста.
+        Возвращает {'result', 'performed', 'new_incident', 'incident_cameras', 'key'};
+        логировать результат стоит только при performed=True - остальные камеры
+        получили тот же результат без отдельного пинга.
+        """
+        key = self.incident_key(host)
+        state = self._state(key)
+        new_incident = False
+        perform = False
+
+        with self._lock:
+            if stream_lost:
+                if state.incident_started is None:
+                    state.incident_started = time.time()
+                    state.affected_total = set()
+                    new_incident = True
+                state.incident_cameras.add(camera_id)
+                state.affected_total.add(camera_id)
+
+            waiter = state.in_flight
+            now = time.time()
+            if waiter is None and (state.last_result is None or now - state.last_probe_time >= self.cooldown_sec):
+                perform = True
+                waiter = state.in_flight = threading.Event()
+                state.last_probe_time = now
+
+        if perform:
+            result = self.ping_func(host)
+            with self._lock:
+                state.last_result = result
+                state.in_flight = None
+            waiter.set()
+        else:
+            if waiter is not None:
+                waiter.wait(10)
+            result = state.last_result or "error"
+
+        return {
+            'result': result,
+            'performed': perform,
+            'new_incident': new_incident,
+            'incident_cameras': len(state.incident_cameras),
+            'key': key
+        }
+
+    def resolve(self, camera_id, host):
+        """
+        Поток камеры восстановлен. Если это последняя камера инцидента -
+        возвращает сводку {'key', 'cameras', 'duration'} для одной строки лога.
+        """
+        key = self.incident_key(host)
+        state = self._state(key)
+        with self._lock:
+            if camera_id not in state.incident_cameras:
+                return None
+            state.incident_cameras.discard(camera_id)
+            if state.incident_cameras or state.incident_started is None:
+                return None
+            summary = {
+                'key': key,
+                'cameras': len(state.affected_total),
+                'duration': time.time() - state.incident_started
+            }
+            state.incident_started = None
+            state.affected_total = set()
+            return summary
+
+
+# Общий координатор процесса: все мониторы процесса делят пинги и инциденты
+host_probes = HostProbeCoordinator()
@@ -0,0 +1,364 @@
+import sys
+import tracemalloc
+import zlib
+
+import cv2
+import numpy as np
+
+HIST_WIDTH = 320  # Ширина выборки кадра для гистограмм
+LEVELS = np.arange(256, dtype=np.float64)
+# Шум по медиане отклика ядра Иммеркера [1 -2 1] x [1 -2 1]: sigma = 1.4826 * median / ||ядро||.
+# Ядро не реагирует на яркость, градиенты и полосы вдоль осей - остается в основном шум
+NOISE_KERNEL = np.array([1.0, -2.0, 1.0], dtype=np.float32)
+NOISE_SCALE = 1.4826 / 6.0
+
+
+class WorkBuffers:
+    """
+    Рабочие буферы анализа одной камеры: передаются в OpenCV как dst и
+    переиспользуются между кадрами. Новый буфер выделяется только при смене разрешения.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer
+
+
+def _hist_stats(hist):
+    """Среднее и стандартное отклонение уровня по гистограмме"""
+    total = hist.sum()
+    if total <= 0:
+        return 0.0, 0.0
+    mean = float(hist @ LEVELS) / total
+    var = float(hist @ (LEVELS * LEVELS)) / total - mean * mean
+    return mean, float(np.sqrt(max(var, 0.0)))
+
+
+def _hist_median(hist):
+    cumulative = np.cumsum(hist)
+    return float(np.searchsorted(cumulative, cumulative[-1] / 2.0))
+
+
+def sample_histograms(frame, buffers=None):
+    """
+    Гистограммы яркости (Y) и цветности (Cr, Cb) по выборке кадра (прореживание INTER_NEAREST).
+    Годится только для распределения уровней: мелкая текстура на выборке алиасится,
+    поэтому шум оценивается по кадру в исходном разрешении (noise_level).
+    """
+    buffers = buffers or WorkBuffers()
+    height, width = frame.shape[:2]
+    if width > HIST_WIDTH:
+        sample_height = max(1, height * HIST_WIDTH // width)
+        frame = cv2.resize(frame, (HIST_WIDTH, sample_height), interpolation=cv2.INTER_NEAREST,
+                           dst=buffers.get('sample', (sample_height, HIST_WIDTH, 3)))
+    height, width = frame.shape[:2]
+    ycrcb = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb, dst=buffers.get('ycrcb', (height, width, 3)))
+    hists = [cv2.calcHist([ycrcb], [channel], None, [256], [0, 256],
+                          hist=buffers.get(f'hist{channel}', (256, 1), np.float32)).ravel()
+             for channel in range(3)]
+    return hists
+
+
+def noise_level(gray, buffers=None):
+    """
+    Оценка СКО шума яркости (метод Иммеркера) в исходном разрешении:
+    робастная медиана |отклика ядра| устойчива к краям и текстуре сцены.
+    """
+    buffers = buffers or WorkBuffers()
+    response = cv2.sepFilter2D(gray, cv2.CV_16S, NOISE_KERNEL, NOISE_KERNEL,
+                               dst=buffers.get('noise_response', gray.shape, np.int16))
+    response = cv2.convertScaleAbs(response, dst=buffers.get('noise_response_abs', gray.shape))
+    hist = cv2.calcHist([response], [0], None, [256], [0, 256],
+                        hist=buffers.get('hist_noise', (256, 1), np.float32)).ravel()
+    return NOISE_SCALE * _hist_median(hist)
+
+
+def blockiness(gray, step=2, buffers=None):
+    """
+    Блочность по сетке кодека: отношение средних перепадов яркости на границах блоков 8/16 пикселей
+    к перепадам внутри блоков. ~1 для обычного кадра, заметно больше - артефакты сжатия или
+    размазанные макроблоки при потере пакетов. step - прореживание строк для вертикальных границ.
+    """
+    height, width = gray.shape[:2]
+    if height < 32 or width < 32:
+        return 1.0
+    buffers = buffers or WorkBuffers()
+    cols = (width - 1) // 16 * 16
+    rows = (height - 1) // 16 * 16
+    # Перепады между соседними столбцами (вертикальные границы блоков), суммы по фазе в блоке 16
+    dx_rows = (height + step - 1) // step
+    dx = cv2.absdiff(gray[::step, 1:cols + 1], gray[::step, :cols], dst=buffers.get('block_dx', (dx_rows, cols)))
+    profile_x = cv2.reduce(dx, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S,
+                           dst=buffers.get('block_px', (1, cols), np.int32)).reshape(-1, 16).sum(axis=0)
+    # Перепады между соседними строками (горизонтальные границы блоков)
+    dy = cv2.absdiff(gray[1:rows + 1], gray[:rows], dst=buffers.get('block_dy', (rows, width)))
+    profile_y = cv2.reduce(dy, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S,
+                           dst=buffers.get('block_py', (rows, 1), np.int32)).reshape(-1, 16).sum(axis=0)
+    profile = profile_x / float(dx.size) + profile_y / float(dy.size)
+    # Перепад i - между пикселями i и i+1 блока: границы сетки 8 - фазы 7 и 15
+    edges = (profile[7] + profile[15]) / 2.0
+    inner = (profile.sum() - profile[7] - profile[15]) / 14.0
+    return float((edges + 0.05) / (inner + 0.05))
+
+
+class SceneChangeDetector:
+    """
+    Поворот, закрытие и расфокусировка камеры: сравнение миниатюры кадра с
+    фоновой моделью (скользящее среднее миниатюр). Кадр сравнивается не сам по себе,
+    а с тем, как камера выглядела раньше; работа идет на миниатюре 64x36.
+    """
+
+    THUMB_SIZE = (64, 36)
+
+    def __init__(self, alpha=0.05, warmup=10, change_threshold=0.5, persist=3):
+        self.alpha = alpha  # Скорость обновления фона
+        self.warmup = warmup  # Кадров до начала проверок
+        self.change_threshold = change_threshold  # Доля изменившихся клеток для смены сцены
+        self.persist = persist  # Подряд идущих кадров со сменой (проезжающая машина - не поворот)
+        self.background = None
+        self.small = np.empty(self.THUMB_SIZE[::-1], dtype=np.uint8)
+        self.thumb = np.empty(self.THUMB_SIZE[::-1], dtype=np.float32)
+        self.diff = np.empty(self.THUMB_SIZE[::-1], dtype=np.float32)
+        self.samples = 0
+        self.changed_run = 0
+        self.sharpness_baseline = None  # Обычная резкость этой камеры (EWMA)
+
+    def update(self, gray, sharpness=None):
+        """
+        Метрики смены сцены для кадра в оттенках серого.
+        sharpness - уже посчитанная резкость кадра, сравнивается с обычной для камеры.
+        """
+        cv2.resize(gray, self.THUMB_SIZE, dst=self.small, interpolation=cv2.INTER_AREA)
+        thumb = self.thumb
+        thumb[...] = self.small
+        metrics = {}
+        if self.background is None:
+            self.background = thumb.copy()
+            self.samples = 1
+            return metrics
+
+        self.samples += 1
+        diff = cv2.absdiff(thumb, self.background, dst=self.diff)
+        # Клетка изменилась, если отличается от фона больше чем на 25 уровней яркости
+        changed = float(np.count_nonzero(diff > 25)) / diff.size
+        metrics['scene_change'] = changed
+
+        if self.samples > self.warmup:
+            self.changed_run = self.changed_run + 1 if changed > self.change_threshold else 0
+            # После подтверждения флаг держится, пока фон не выучит новую сцену (changed ниже порога)
+            if self.changed_run >= self.persist:
+                metrics['scene_changed'] = True
+                bg_std = float(self.background.std())
+                if float(thumb.std()) < bg_std * 0.35:
+                    metrics['covered'] = True
+            # Резкость упала при той же сцене - расфокусировка или запотевание
+            if (sharpness is not None and self.sharpness_baseline
+                    and sharpness < self.sharpness_baseline * 0.3 and changed < self.change_threshold):
+                metrics['defocused'] = True
+
+        # Фон догоняет новую сцену: после поворота тревога снимается сама. Неподтвержденная смена
+        # (проезжающая машина, начало поворота) в фон не попадает, иначе он выучит ее до подтверждения
+        if not 0 < self.changed_run < self.persist:
+            cv2.accumulateWeighted(thumb, self.background, self.alpha)
+        if sharpness is not None:
+            self.sharpness_baseline = (sharpness if self.sharpness_baseline is None else
+                                       self.sharpness_baseline + self.alpha * (sharpness - self.sharpness_baseline))
+        return metrics
+
+
+class QualityAnalyzer:
+    """Анализ качества изображения одной камеры (общий для мониторов и анализаторов)"""
+
+    def __init__(self, camera_id="cam_1", detect_freeze=True, detect_tamper=True):
+        self.camera_id = camera_id
+        self.detect_freeze = detect_freeze
+        self.freeze_detector = []  # Для детекции замороженного изображения
+        self.last_frame_hash = None
+        # Поворот/закрытие/расфокусировка относительно фоновой модели камеры
+        self.scene = SceneChangeDetector() if detect_tamper else None
+        self.blockiness_avg = None  # Обычная блочность камеры (EWMA по кадрам без артефактов)
+        self.blockiness_samples = 0
+        self.buffers = WorkBuffers()  # Буферы кадра: анализ не выделяет память на каждый кадр
+
+    def seed_baseline(self, quality):
+        """
+        Обычные уровни камеры из сохраненных показателей (baselines.py): блочность и резкость
+        сравниваются с ними с первого кадра, без прогрева после перезапуска.
+        """
+        if not quality:
+            return
+        if quality.get('blockiness') is not None:
+            self.blockiness_avg = max(1.0, float(quality['blockiness']))
+            self.blockiness_samples = max(self.blockiness_samples, 10)
+        if self.scene is not None and quality.get('sharpness') is not None:
+            self.scene.sharpness_baseline = float(quality['sharpness'])
+
+    def track_scene(self, frame):
+        """Только смена сцены/закрытие - для кадров между полными анализами (флаг держится считанные кадры)"""
+        if self.scene is None or frame is None:
+            return {}
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffers.get('gray', frame.shape[:2]))
+        return self.scene.update(gray)
+
+    def analyze(self, frame):
+        """Анализ качества изображения"""
+        quality_metrics = {}
+
+        if frame is None:
+            return quality_metrics
+
+        try:
+            buffers = self.buffers
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.get('gray', frame.shape[:2]))
+            # Одна выборка гистограмм на кадр - для яркости, контраста, экспозиции и цвета
+            luma_hist, cr_hist, cb_hist = sample_histograms(frame, buffers)
+            pixels = float(luma_hist.sum()) or 1.0
+
+            # 1. Детекция черного/белого экрана
+            mean_brightness, contrast = _hist_stats(luma_hist)
+            quality_metrics['brightness'] = mean_brightness
+            if mean_brightness < 10:
+                quality_metrics['black_screen'] = True
+            elif mean_brightness > 240:
+                quality_metrics['white_screen'] = True
+
+            # Экспозиция: доля пикселей в обрезанных хвостах гистограммы
+            clipped_dark = float(luma_hist[:17].sum()) / pixels
+            clipped_bright = float(luma_hist[245:].sum()) / pixels
+            quality_metrics['clipped_dark'] = clipped_dark
+            quality_metrics['clipped_bright'] = clipped_bright
+            quality_metrics['underexposed'] = clipped_dark > 0.4 and not quality_metrics.get('black_screen')
+            quality_metrics['overexposed'] = clipped_bright > 0.3 and not quality_metrics.get('white_screen')
+
+            # Цветовой сдвиг (например, залип ИК-фильтр): смещение средних Cr/Cb от нейтральных 128
+            chroma_shift = float(np.hypot(_hist_stats(cr_hist)[0] - 128.0, _hist_stats(cb_hist)[0] - 128.0))
+            quality_metrics['chroma_shift'] = chroma_shift
+            quality_metrics['color_cast'] = chroma_shift > 20
+
+            # Шум: по яркости в исходном разрешении (на выборке текстура сцены выглядит как шум)
+            noise = noise_level(gray, buffers)
+            quality_metrics['noise'] = noise
+            quality_metrics['noisy'] = noise > 6
+
+            # 2. Анализ резкости (вариация Лапласа)
+            # CV_16S вмещает Лапласиан 8-битного кадра без потерь и вчетверо меньше CV_64F
+            laplacian = cv2.Laplacian(gray, cv2.CV_16S, dst=buffers.get('laplacian', gray.shape, np.int16))
+            laplacian_var = float(cv2.meanStdDev(laplacian)[1][0, 0]) ** 2
+            quality_metrics['sharpness'] = laplacian_var
+            quality_metrics['blurry'] = laplacian_var < 50  # Порог для размытости
+
+            # 3. Детекция замороженного изображения
+            if self.detect_freeze:
+                # CRC по буферу кадра без копии в bytes
+                current_hash = zlib.crc32(gray)
+                if self.last_frame_hash == current_hash:
+                    self.freeze_detector.append(True)
+                else:
+                    self.freeze_detector.append(False)
+
+                self.last_frame_hash = current_hash
+                if len(self.freeze_detector) > 30:
+                    self.freeze_detector.pop(0)
+
+                # Если 10 из последних 30 кадров идентичны - заморозка
+                if sum(self.freeze_detector) > 10:
+                    quality_metrics['frozen'] = True
+
+            # 4. Анализ контраста (по гистограмме яркости)
+            quality_metrics['contrast'] = contrast
+            quality_metrics['low_contrast'] = contrast < 20
+
+            # 5. Блочность (артефакты сжатия, потеря пакетов) - относительно обычной для камеры
+            block_score = blockiness(gray, buffers=buffers)
+            quality_metrics['blockiness'] = block_score
+            # Первые кадры задают обычный уровень камеры (у части кодеков сетка видна всегда)
+            warm = self.blockiness_samples >= 10
+            blocky = block_score > 3.0 or (warm and block_score > max(1.5, self.blockiness_avg * 1.4))
+            quality_metrics['blocky'] = blocky
+            if not blocky:
+                self.blockiness_samples += 1
+                self.blockiness_avg = block_score if self.blockiness_avg is None else (
+                    self.blockiness_avg + (0.05 if warm else 0.3) * (block_score - self.blockiness_avg))
+
+            # 6. Смена сцены, закрытие и расфокусировка камеры
+            if self.scene is not None:
+                quality_metrics.update(self.scene.update(gray, laplacian_var))
+
+        except Exception as e:
+            print(f"[{self.camera_id}] WARNING: Ошибка анализа изображения: {e}")
+
+        return quality_metrics
+
+    @staticmethod
+    def detect_problems(quality_metrics):
+        """Определение конкретных проблем"""
+        problems = []
+
+        if quality_metrics.get('black_screen'):
+            problems.append("Черный экран")
+        if quality_metrics.get('white_screen'):
+            problems.append("Белый экран")
+        if quality_metrics.get('blurry'):
+            problems.append("Размытое изображение")
+        if quality_metrics.get('frozen'):
+            problems.append("Замороженное изображение")
+        if quality_metrics.get('low_contrast'):
+            problems.append("Низкая контрастность")
+        if quality_metrics.get('underexposed'):
+            problems.append("Недоэкспонирование")
+        if quality_metrics.get('overexposed'):
+            problems.append("Пересвет")
+        if quality_metrics.get('color_cast'):
+            problems.append("Цветовой сдвиг")
+        if quality_metrics.get('noisy'):
+            problems.append("Шум изображения")
+        if quality_metrics.get('blocky'):
+            problems.append("Блочность (артефакты сжатия / потеря пакетов)")
+        if quality_metrics.get('covered'):
+            problems.append("Камера закрыта")
+        elif quality_metrics.get('scene_changed'):
+            problems.append("Смена сцены (камера повернута?)")
+        if quality_metrics.get('defocused'):
+            problems.append("Расфокусировка")
+
+        return problems
+
+
+def measure_allocations(analyzer, frame, frames=50, warmup=30):
+    """
+    Память, выделяемая анализом в установившемся режиме (tracemalloc учитывает и буферы numpy/OpenCV).
+    warmup - кадры до замера: выделение буферов и заполнение окна заморозки (30 кадров).
+    Возвращает (пик за кадр, прирост за все кадры) в байтах.
+    """
+    for _ in range(warmup):
+        analyzer.analyze(frame)
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            analyzer.analyze(frame)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        growth = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return peak, growth
+
+
+if __name__ == "__main__":
+    # Самопроверка: анализ кадра 1920x1080 не должен выделять память размером с кадр
+    # (до буферов - ~34 МБ временных массивов на кадр; остаются только мелкие массивы numpy)
+    rng = np.random.default_rng(0)
+    test_frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    peak_bytes, growth_bytes = measure_allocations(QualityAnalyzer("selfcheck"), test_frame)
+    limit = 64 * 1024
+    print(f"Пик выделений за кадр: {peak_bytes / 1024:.1f} КБ, прирост: {growth_bytes / 1024:.1f} КБ "
+          f"(лимит {limit / 1024:.1f} КБ)")
+    sys.exit(0 if peak_bytes < limit and growth_bytes < limit else 1)
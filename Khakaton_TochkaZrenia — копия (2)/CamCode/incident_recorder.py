@@ -0,0 +1,205 @@
+import collections
+import json
+import os
+import sys
+from datetime import datetime
+
+import cv2
+
+# Писатель должен быть настоящим потоком ОС и под eventlet.monkey_patch (server.py)
+if 'eventlet' in sys.modules:
+    from eventlet.patcher import original
+    threading = original('threading')
+    queue = original('queue')
+else:
+    import queue
+    import threading
+
+INCIDENT_DIR = os.environ.get(
+    'INCIDENT_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'incidents'))
+
+
+class MemoryBudget:
+    """Общий лимит памяти кольцевых буферов всех камер процесса"""
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self._recorders = set()
+        self._lock = threading.Lock()
+
+    def register(self, recorder):
+        with self._lock:
+            self._recorders.add(recorder)
+
+    def unregister(self, recorder):
+        with self._lock:
+            self._recorders.discard(recorder)
+
+    def per_camera(self):
+        """Доля камеры: лимит делится поровну между работающими камерами"""
+        return self.total_bytes // max(1, len(self._recorders))
+
+
+class IncidentWriter:
+    """Фоновая запись инцидентов на диск: захват кадров не ждет файловую систему"""
+
+    def __init__(self, root=INCIDENT_DIR):
+        self.root = root
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, incident):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="incident-writer", daemon=True)
+                self._thread.start()
+        self.queue.put(incident)
+
+    def _loop(self):
+        while True:
+            incident = self.queue.get()
+            try:
+                self._write(incident)
+            except Exception as e:
+                print(f"[INCIDENT_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+
+    def _write(self, incident):
+        started = datetime.fromtimestamp(incident['trigger_time'])
+        path = os.path.join(self.root, f"{incident['camera_id']}_{started.strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(path, exist_ok=True)
+        frames = []
+        for index, (timestamp, jpeg) in enumerate(incident['frames']):
+            name = f"frame_{index:04d}.jpg"
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(jpeg)
+            frames.append({'file': name, 'offset': round(timestamp - incident['trigger_time'], 3)})
+        meta = {
+            'camera_id': incident['camera_id'],
+            'reasons': incident['reasons'],
+            'trigger_time': started.isoformat(),
+            'pre_roll_frames': incident['pre_roll'],
+            'frames': frames
+        }
+        if incident.get('truncated'):
+            meta['truncated'] = incident['truncated']
+        with open(os.path.join(path, 'incident.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        print(f"[{incident['camera_id']}] INFO: Инцидент записан: {path} ({len(frames)} кадров)")
+
+
+# Общие для процесса лимит памяти и писатель
+memory_budget = MemoryBudget(int(float(os.environ.get('INCIDENT_MEMORY_MB', '256')) * 1024 * 1024))
+incident_writer = IncidentWriter()
+
+
+class IncidentRecorder:
+    """
+    Кольцо последних pre_sec секунд кадров камеры в JPEG (уменьшенных до max_width).
+    При алерте кольцо (pre-roll) и следующие post_sec секунд уходят писателю.
+    Кадры сохраняются с частотой sample_fps. Доля общего лимита камеры покрывает и кольцо,
+    и кадры открытого инцидента, уже вытесненные из кольца; при ее превышении (длинная
+    серия продлений) инцидент закрывается досрочно.
+    """
+
+    def __init__(self, camera_id, pre_sec=10.0, post_sec=5.0, max_post_sec=30.0, sample_fps=5.0, max_width=640,
+                 jpeg_quality=70, cooldown_sec=60.0, budget=memory_budget, writer=incident_writer):
+        self.camera_id = camera_id
+        self.pre_sec = pre_sec
+        self.post_sec = post_sec
+        self.max_post_sec = max_post_sec  # Повторные алерты продлевают post-roll не дальше этого от начала
+        self.sample_interval = 1.0 / sample_fps
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.cooldown_sec = cooldown_sec  # Повторные алерты не пишут новый инцидент
+        self.budget = budget
+        self.writer = writer
+        self.ring = collections.deque()  # (timestamp, jpeg)
+        self.ring_bytes = 0
+        self.last_sample = 0.0
+        self.incident = None  # Инцидент, для которого идет запись post-roll
+        self.last_incident_end = 0.0
+        budget.register(self)
+
+    def due(self, timestamp):
+        """Нужен ли кадр с этим временем (проверка без кодирования)"""
+        return timestamp - self.last_sample >= self.sample_interval
+
+    def _encode(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(height * self.max_width / width)),
+                               interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return jpeg.tobytes() if ok else None
+
+    def add(self, frame, timestamp):
+        """Кадр монитора; кодируется, только если подошло время очередного кадра кольца"""
+        if frame is None or not self.due(timestamp):
+            return
+        self.last_sample = timestamp
+        jpeg = self._encode(frame)
+        if jpeg is None:
+            return
+
+        self.ring.append((timestamp, jpeg))
+        self.ring_bytes += len(jpeg)
+        if self.incident is not None:
+            self.incident['frames'].append((timestamp, jpeg))
+        limit = self.budget.per_camera()
+        # Вне инцидента часть доли остается под post-roll: post_sec секунд кадров среднего размера
+        reserve = self.ring_bytes / len(self.ring) * self.post_sec / self.sample_interval
+        ring_limit = max(limit - reserve, limit / 2)
+        while self.ring and (self.ring[0][0] < timestamp - self.pre_sec
+                             or (self.incident is None and self.ring_bytes > ring_limit)):
+            evicted, evicted_jpeg = self.ring.popleft()
+            self.ring_bytes -= len(evicted_jpeg)
+            # Кадр инцидента остается в памяти до записи - он по-прежнему в доле камеры
+            if self.incident is not None and evicted >= self.incident['start']:
+                self.incident['evicted_bytes'] += len(evicted_jpeg)
+
+        if self.incident is not None:
+            if self.held_bytes() > limit:
+                self.incident['truncated'] = 'лимит памяти'
+                self._finish(timestamp)
+            elif timestamp >= self.incident['post_until']:
+                self._finish(timestamp)
+
+    def held_bytes(self):
+        """Память камеры: кольцо и кадры открытого инцидента вне кольца"""
+        return self.ring_bytes + (self.incident['evicted_bytes'] if self.incident is not None else 0)
+
+    def trigger(self, reason, timestamp):
+        """Алерт: начало записи инцидента (или продление текущего post-roll)"""
+        if self.incident is not None:
+            self.incident['reasons'].append(reason)
+            self.incident['post_until'] = min(timestamp + self.post_sec,
+                                              self.incident['trigger_time'] + self.max_post_sec)
+            return False
+        if timestamp - self.last_incident_end < self.cooldown_sec:
+            return False
+        pre_roll = list(self.ring)
+        self.incident = {
+            'camera_id': self.camera_id,
+            'reasons': [reason],
+            'trigger_time': timestamp,
+            'post_until': timestamp + self.post_sec,
+            'pre_roll': len(pre_roll),
+            'frames': pre_roll,
+            'start': pre_roll[0][0] if pre_roll else timestamp,
+            'evicted_bytes': 0
+        }
+        return True
+
+    def _finish(self, timestamp):
+        self.writer.submit(self.incident)
+        self.incident = None
+        self.last_incident_end = timestamp
+
+    def close(self, timestamp=None):
+        """Остановка монитора: недописанный инцидент сохраняется с тем, что есть"""
+        if self.incident is not None:
+            self._finish(timestamp or self.incident['post_until'])
+        self.ring.clear()
+        self.ring_bytes = 0
+        self.budget.unregister(self)
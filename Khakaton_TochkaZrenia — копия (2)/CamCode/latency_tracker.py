@@ -0,0 +1,91 @@
+import time
+
+from quantiles import StreamingQuantiles
+from watermark import decode_watermark
+
+
+class LatencyTracker:
+    """
+    Задержка "от стекла до алерта" по пиксельной метке эмулятора:
+    capture - от отправки кадра до cap.read(),
+    detection - от первого кадра с неисправностью до решения об алерте,
+    emit - от решения до отправки (print/socketio.emit).
+    """
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        # Потоковые квантили вместо хранения выборок: память не растет
+        self.capture_lag_ms = StreamingQuantiles()
+        self.detection_lag_ms = StreamingQuantiles()
+        self.emit_lag_ms = StreamingQuantiles()
+        self.watermarked = False
+        self.last_sequence = None
+        self.fault_onset_ms = None  # Начало текущей неисправности (метка первого кадра с ней)
+        self.alerted = False  # Был ли алерт за текущую неисправность
+        self.missed_faults = 0
+        self._pending_decision = None
+
+    def on_frame(self, frame, capture_time=None):
+        """Разбор метки очередного кадра; кадры без метки игнорируются"""
+        mark = decode_watermark(frame)
+        if mark is None:
+            return None
+        capture_ms = (capture_time if capture_time is not None else time.time()) * 1000.0
+        self.watermarked = True
+        self.last_sequence = mark['sequence']
+        self.capture_lag_ms.add(capture_ms - mark['timestamp_ms'])
+
+        if mark['fault'] and self.fault_onset_ms is None:
+            self.fault_onset_ms = mark['timestamp_ms']
+            self.alerted = False
+        elif not mark['fault'] and self.fault_onset_ms is not None:
+            # Неисправность закончилась; без алерта за нее - пропущена
+            if not self.alerted:
+                self.missed_faults += 1
+            self.fault_onset_ms = None
+            self.alerted = False
+        return mark
+
+    def on_alert(self, decision_time=None):
+        """Монитор принял решение об алерте"""
+        decision_time = decision_time if decision_time is not None else time.time()
+        self._pending_decision = decision_time
+        # Задержка обнаружения - только по первому алерту за неисправность
+        if self.fault_onset_ms is not None and not self.alerted:
+            self.detection_lag_ms.add(decision_time * 1000.0 - self.fault_onset_ms)
+            self.alerted = True
+
+    def on_emit(self, emitted_time=None):
+        """Алерт выведен/отправлен"""
+        if self._pending_decision is None:
+            return
+        emitted_time = emitted_time if emitted_time is not None else time.time()
+        self.emit_lag_ms.add((emitted_time - self._pending_decision) * 1000.0)
+        self._pending_decision = None
+
+    def summary(self):
+        """Распределения задержек (мс) для отчета и status_update"""
+        if not self.watermarked:
+            return None
+        return {
+            'captureLagMs': self.capture_lag_ms.summary(),
+            'detectionLagMs': self.detection_lag_ms.summary(),
+            'emitLagMs': self.emit_lag_ms.summary(),
+            'missedFaults': self.missed_faults
+        }
+
+    def format_report(self):
+        """Строка отчета для лога"""
+        summary = self.summary()
+        if summary is None:
+            return None
+        parts = []
+        for name, key in (('capture', 'captureLagMs'), ('detection', 'detectionLagMs'), ('emit', 'emitLagMs')):
+            dist = summary[key]
+            if dist:
+                parts.append(f"{name} p50/p95/p99/max: {dist['p50']}/{dist['p95']}/{dist['p99']}/{dist['max']}ms "
+                             f"(n={dist['count']})")
+            else:
+                parts.append(f"{name}: --")
+        parts.append(f"пропущено неисправностей: {summary['missedFaults']}")
+        return f"[{self.camera_id}] LATENCY: " + " | ".join(parts)
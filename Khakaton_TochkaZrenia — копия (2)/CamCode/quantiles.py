@@ -0,0 +1,94 @@
+import math
+
+# Потоковые квантили с постоянной памятью: выбросы (скачки задержки, провалы FPS)
+# не растворяются в среднем, а хранить все значения не нужно.
+
+
+class P2Quantile:
+    """
+    Оценка одного квантиля алгоритмом P² (Jain, Chlamtac, 1985): пять маркеров,
+    высоты которых подстраиваются параболической интерполяцией. O(1) памяти и времени на значение.
+    """
+
+    def __init__(self, q):
+        self.q = q
+        self.heights = []  # Высоты маркеров (первые 5 значений - как есть)
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * q, 4 * q, 2 + 2 * q, 4.0]
+        self.increments = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+
+    def add(self, x):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Сдвиг трех средних маркеров к желаемым позициям
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        heights = self.heights
+        if not heights:
+            return None
+        if len(heights) < 5:
+            # Пока значений мало - точный квантиль по ним
+            return heights[min(len(heights) - 1, int(self.q * len(heights)))]
+        return heights[2]
+
+
+class StreamingQuantiles:
+    """Набор квантилей одной величины плюс число значений и максимум"""
+
+    def __init__(self, quantiles=(0.5, 0.95, 0.99)):
+        self.estimators = {f"p{round(q * 100):g}": P2Quantile(q) for q in quantiles}
+        self.count = 0
+        self.max = None
+
+    def add(self, x):
+        if x is None or math.isnan(x):
+            return
+        self.count += 1
+        self.max = x if self.max is None or x > self.max else self.max
+        for estimator in self.estimators.values():
+            estimator.add(x)
+
+    def summary(self, ndigits=1):
+        """{'count', 'p50', 'p95', 'p99', 'max'} или None, если значений не было"""
+        if not self.count:
+            return None
+        result = {'count': self.count}
+        for name, estimator in self.estimators.items():
+            result[name] = round(estimator.value(), ndigits)
+        result['max'] = round(self.max, ndigits)
+        return result
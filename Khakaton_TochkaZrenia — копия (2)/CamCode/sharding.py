@@ -0,0 +1,316 @@
+import bisect
+import hashlib
+import hmac
+import json
+import socket
+import threading
+import time
+from datetime import datetime
+
+from camera_config import diff_configs
+
+# Распределение камер между воркерами мониторинга.
+# Сервер (координатор) принимает TCP-подключения воркеров, назначает камеры по
+# консистентному хешированию и получает от воркеров события status_update/log_entry.
+# Протокол - JSON по строке на сообщение:
+#   воркер -> сервер: {"type": "hello", "worker": id, "token": общий токен}, {"type": "heartbeat"},
+#                     {"type": "event", "event": имя, "data": {...}}
+#   сервер -> воркер: {"type": "assign", "cameras": {camera_id: настройки}}, {"type": "heartbeat"}
+# Назначение содержит RTSP URL с учетными данными, поэтому камеры получает только воркер
+# с верным токеном. Канал не шифруется: воркеры вне localhost - через VPN или SSH-туннель.
+HEARTBEAT_SEC = 5.0
+# Аренда камер воркером: без сообщений сервера дольше LEASE_SEC воркер останавливает свои камеры.
+# Аренда короче таймаута heartbeat сервера (3 * HEARTBEAT_SEC): камеры останавливаются раньше,
+# чем сервер передаст их другому воркеру, и одна камера не мониторится дважды.
+LEASE_SEC = 2 * HEARTBEAT_SEC
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def _json_default(value):
+    # numpy-скаляры в метриках мониторов
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+
+def send_message(sock, message):
+    sock.sendall((json.dumps(message, ensure_ascii=False, default=_json_default) + "\n").encode('utf-8'))
+
+
+class HashRing:
+    """
+    Консистентное хеширование: при добавлении или потере воркера
+    переезжают только камеры этого воркера (~1/N камер).
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas  # Виртуальных точек на воркер - для равномерности
+        self._keys = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._nodes.values()))
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self._nodes:
+                bisect.insort(self._keys, point)
+                self._nodes[point] = node
+
+    def remove(self, node):
+        points = [point for point, owner in self._nodes.items() if owner == node]
+        for point in points:
+            del self._nodes[point]
+            self._keys.pop(bisect.bisect_left(self._keys, point))
+
+    def node_for(self, key):
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[self._keys[index]]
+
+    def assign(self, keys):
+        """{воркер: [ключи]}"""
+        result = {}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                result.setdefault(node, []).append(key)
+        return result
+
+
+class ShardCoordinator:
+    """Сторона сервера: воркеры, кольцо и перераспределение камер"""
+
+    def __init__(self, port, token, on_event, host='127.0.0.1', heartbeat_timeout=3 * HEARTBEAT_SEC):
+        if not token:
+            raise ValueError("Для приема воркеров нужен общий токен (SHARD_TOKEN или --shard-token)")
+        self.host = host
+        self.port = port
+        self.token = token
+        self.on_event = on_event  # (event, data) от любого воркера
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ring = HashRing()
+        self.cameras = {}  # camera_id -> настройки, которые должны мониториться
+        self.workers = {}  # worker_id -> {'sock', 'last_seen'}
+        self.assignment = {}  # worker_id -> {camera_id: настройки}, последнее отправленное
+        self._lock = threading.RLock()
+        self._server = None
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(64)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._reaper_loop, daemon=True).start()
+        print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Прием воркеров на {self.host}:{self.port}")
+
+    def set_cameras(self, cameras):
+        """Новый набор камер (пустой - мониторинг остановлен)"""
+        with self._lock:
+            self.cameras = dict(cameras)
+            self._rebalance()
+
+    def _rebalance(self):
+        with self._lock:
+            groups = self.ring.assign(self.cameras)
+            for worker_id, worker in list(self.workers.items()):
+                cameras = {camera_id: self.cameras[camera_id] for camera_id in groups.get(worker_id, [])}
+                if self.assignment.get(worker_id) == cameras:
+                    continue
+                try:
+                    send_message(worker['sock'], {'type': 'assign', 'cameras': cameras})
+                    self.assignment[worker_id] = cameras
+                except OSError:
+                    self._drop(worker_id, "ошибка отправки")
+                    return self._rebalance()
+            unassigned = len(self.cameras) - sum(len(v) for v in groups.values())
+            if unassigned:
+                print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Нет воркеров: без мониторинга {unassigned} камер")
+
+    def _drop(self, worker_id, reason):
+        with self._lock:
+            worker = self.workers.pop(worker_id, None)
+            if worker is None:
+                return False
+            self.ring.remove(worker_id)
+            self.assignment.pop(worker_id, None)
+        try:
+            worker['sock'].close()
+        except OSError:
+            pass
+        print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Воркер {worker_id} отключен ({reason}), "
+              f"перераспределение камер")
+        return True
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(sock, address), daemon=True).start()
+
+    def _handle(self, sock, address):
+        worker_id = None
+        try:
+            for line in sock.makefile('r', encoding='utf-8'):
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'hello':
+                    if not hmac.compare_digest(str(message.get('token', '')).encode('utf-8'),
+                                               self.token.encode('utf-8')):
+                        print(f"[SHARD_ERROR] {datetime.now().strftime('%H:%M:%S')} - {address[0]}: "
+                              f"неверный токен воркера, соединение закрыто")
+                        sock.close()
+                        return
+                    worker_id = message['worker']
+                    with self._lock:
+                        if worker_id in self.workers:
+                            self._drop(worker_id, "повторное подключение")
+                        self.workers[worker_id] = {'sock': sock, 'last_seen': time.time()}
+                        self.ring.add(worker_id)
+                        print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Воркер {worker_id} подключен "
+                              f"({address[0]}), воркеров: {len(self.workers)}")
+                        self._rebalance()
+                    continue
+                if worker_id is None:
+                    continue
+                worker = self.workers.get(worker_id)
+                if worker is None or worker['sock'] is not sock:
+                    break  # Воркер уже заменен или снят по таймауту
+                worker['last_seen'] = time.time()
+                if kind == 'event':
+                    self.on_event(message['event'], message['data'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[SHARD_ERROR] {datetime.now().strftime('%H:%M:%S')} - {worker_id or address[0]}: {e}")
+        finally:
+            if worker_id is not None:
+                with self._lock:
+                    worker = self.workers.get(worker_id)
+                    if worker is not None and worker['sock'] is sock and self._drop(worker_id, "соединение закрыто"):
+                        self._rebalance()
+
+    def _reaper_loop(self):
+        while True:
+            time.sleep(HEARTBEAT_SEC)
+            now = time.time()
+            with self._lock:
+                stale = [worker_id for worker_id, worker in self.workers.items()
+                         if now - worker['last_seen'] > self.heartbeat_timeout]
+                for worker_id in stale:
+                    self._drop(worker_id, "нет heartbeat")
+                # Heartbeat сервера продлевает аренду камер у воркеров
+                for worker_id, worker in list(self.workers.items()):
+                    try:
+                        send_message(worker['sock'], {'type': 'heartbeat'})
+                    except OSError:
+                        stale.append(worker_id)
+                        self._drop(worker_id, "ошибка отправки")
+                if stale:
+                    self._rebalance()
+
+
+class ShardWorker:
+    """
+    Сторона воркера: подключение к серверу, применение назначений и публикация событий.
+    Назначение сравнивается с текущим набором (как при изменении camera_config.json):
+    камеры, оставшиеся у воркера, не переподключаются.
+    """
+
+    def __init__(self, worker_id, host, port, token, on_added, on_removed, on_updated, reconnect_sec=5.0):
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.token = token
+        self.on_added = on_added
+        self.on_removed = on_removed
+        self.on_updated = on_updated
+        self.reconnect_sec = reconnect_sec
+        self.cameras = {}
+        self._sock = None
+        self._send_lock = threading.Lock()
+
+    def emit(self, event, data):
+        """Интерфейс socketio.emit для мониторов; без связи с сервером событие теряется"""
+        self._send({'type': 'event', 'event': event, 'data': data})
+
+    def _send(self, message):
+        sock = self._sock
+        if sock is None:
+            return
+        try:
+            with self._send_lock:
+                send_message(sock, message)
+        except OSError:
+            pass
+
+    def _apply(self, cameras):
+        added, removed, restarted, updated = diff_configs(self.cameras, cameras)
+        self.cameras = cameras
+        for camera_id in removed + restarted:
+            self.on_removed(camera_id)
+        for camera_id in added + restarted:
+            self.on_added(camera_id, cameras[camera_id])
+        for camera_id, changes in updated.items():
+            self.on_updated(camera_id, changes)
+        print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Назначено камер: {len(cameras)} "
+              f"(+{len(added)} -{len(removed)} перезапуск {len(restarted)})")
+
+    def _release_all(self):
+        """Аренда истекла: сервер передаст камеры другим воркерам, эти мониторы останавливаются"""
+        if not self.cameras:
+            return
+        cameras, self.cameras = self.cameras, {}
+        for camera_id in cameras:
+            self.on_removed(camera_id)
+        print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Нет связи с сервером: "
+              f"остановлено камер: {len(cameras)}")
+
+    def _heartbeat_loop(self, sock):
+        while self._sock is sock:
+            self._send({'type': 'heartbeat'})
+            time.sleep(HEARTBEAT_SEC)
+
+    def run(self):
+        """
+        Работа до Ctrl+C. При потере связи (разрыв или нет сообщений сервера дольше LEASE_SEC)
+        воркер останавливает свои камеры, после переподключения сервер пришлет актуальное назначение.
+        """
+        while True:
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=10)
+                sock.settimeout(LEASE_SEC)
+            except OSError as e:
+                print(f"[SHARD_ERROR] {datetime.now().strftime('%H:%M:%S')} - Сервер {self.host}:{self.port} "
+                      f"недоступен: {e}")
+                time.sleep(self.reconnect_sec)
+                continue
+            self._sock = sock
+            self._send({'type': 'hello', 'worker': self.worker_id, 'token': self.token})
+            threading.Thread(target=self._heartbeat_loop, args=(sock,), daemon=True).start()
+            print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Воркер {self.worker_id} подключен к "
+                  f"{self.host}:{self.port}")
+            try:
+                for line in sock.makefile('r', encoding='utf-8'):
+                    message = json.loads(line)
+                    if message.get('type') == 'assign':
+                        self._apply(message['cameras'])
+            except (OSError, ValueError) as e:
+                print(f"[SHARD_ERROR] {datetime.now().strftime('%H:%M:%S')} - {e}")
+            finally:
+                self._sock = None
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+                self._release_all()
+            print(f"[SHARD] {datetime.now().strftime('%H:%M:%S')} - Связь с сервером потеряна, переподключение")
+            time.sleep(self.reconnect_sec)
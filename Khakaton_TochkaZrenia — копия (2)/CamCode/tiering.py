@@ -0,0 +1,413 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+import cv2
+
+from capture import FRAME_BUS_SCHEME, open_capture
+from frame_bus import FrameBusCapture
+from frame_timing import FrameTiming
+
+# Уровни мониторинга камер парка:
+#   0 - периодическая проверка доступности (RTSP OPTIONS/DESCRIBE), без чтения потока;
+#   1 - чтение пакетов потока без декодирования: битрейт, FPS, пропуски по меткам;
+#   2 - полный монитор с декодированием и анализом качества.
+# Камера поднимается на уровень выше при аномалии потока и опускается, когда снова здорова,
+# поэтому декодируется только подмножество камер, а не весь парк. Недоступная камера
+# (нет соединения) не повышается: алерт подключения выдается на текущем уровне, а после
+# нескольких неудач подряд камера опускается на проверку доступности и не занимает декодер.
+TIER_PROBE, TIER_PACKETS, TIER_FULL = 0, 1, 2
+TIER_NAMES = {TIER_PROBE: 'проверка доступности', TIER_PACKETS: 'пакеты без декодирования',
+              TIER_FULL: 'полный анализ'}
+
+RTSP_DEFAULT_PORT = 554
+
+
+def _rtsp_request(sock, method, url, cseq, extra=""):
+    request = (f"{method} {url} RTSP/1.0\r\nCSeq: {cseq}\r\n"
+               f"User-Agent: CamCode-probe\r\n{extra}\r\n")
+    sock.sendall(request.encode('ascii', 'replace'))
+    response = b""
+    while b"\r\n\r\n" not in response and len(response) < 65536:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        response += chunk
+    status_line = response.split(b"\r\n", 1)[0].decode('latin-1')
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("RTSP/"):
+        raise OSError(f"не RTSP-ответ: {status_line[:60]!r}")
+    return int(parts[1])
+
+
+def rtsp_probe(url, timeout=3.0):
+    """
+    Проверка RTSP-сервера камеры без открытия сессии: OPTIONS и DESCRIBE.
+    401 тоже означает, что камера жива (поток закрыт паролем).
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    port = parts.port or RTSP_DEFAULT_PORT
+    # Учетные данные в строке запроса RTSP не передаются
+    request_url = urlunsplit((parts.scheme, f"{host}:{port}", parts.path or "/", parts.query, ""))
+    started = time.time()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            status = _rtsp_request(sock, "OPTIONS", request_url, 1)
+            if status in (200, 401):
+                status = _rtsp_request(sock, "DESCRIBE", request_url, 2, "Accept: application/sdp\r\n")
+    except (OSError, ValueError) as e:
+        return {'alive': False, 'status': None, 'rttMs': None, 'error': str(e)}
+    return {'alive': status in (200, 401), 'status': status,
+            'rttMs': round((time.time() - started) * 1000.0, 1), 'error': None}
+
+
+def probe_source(url, timeout=3.0):
+    """Дешевая проверка доступности любого источника: RTSP, HTTP, шина кадров, файл"""
+    if url.startswith(FRAME_BUS_SCHEME):
+        cap = FrameBusCapture(url[len(FRAME_BUS_SCHEME):])
+        alive = cap.isOpened()
+        cap.release()
+        return {'alive': alive, 'status': None, 'rttMs': None, 'error': None if alive else 'нет шины'}
+    parts = urlsplit(url)
+    if parts.scheme in ('rtsp', 'rtsps'):
+        return rtsp_probe(url, timeout)
+    if parts.scheme in ('http', 'https'):
+        # HTTP/MJPEG: достаточно принять TCP-соединение
+        started = time.time()
+        try:
+            socket.create_connection((parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)),
+                                     timeout=timeout).close()
+        except OSError as e:
+            return {'alive': False, 'status': None, 'rttMs': None, 'error': str(e)}
+        return {'alive': True, 'status': None, 'rttMs': round((time.time() - started) * 1000.0, 1), 'error': None}
+    alive = os.path.exists(url)
+    return {'alive': alive, 'status': None, 'rttMs': None, 'error': None if alive else 'файл не найден'}
+
+
+def sample_packets(url, window_sec=3.0, max_packets=500):
+    """
+    Чтение пакетов потока без декодирования (CAP_PROP_FORMAT=-1, бэкенд FFmpeg).
+    Возвращает битрейт, FPS и пропуски кадров по меткам за окно.
+    Если бэкенд не отдает пакеты (raw=False), кадры декодируются - метрики те же.
+    """
+    cap = open_capture(url)
+    try:
+        if not cap.isOpened():
+            return {'opened': False, 'packets': 0}
+        raw = isinstance(cap, cv2.VideoCapture) and cap.set(cv2.CAP_PROP_FORMAT, -1)
+        timing = FrameTiming()
+        packets = 0
+        total_bytes = 0
+        started = time.time()
+        while packets < max_packets and time.time() - started < window_sec:
+            ret, packet = cap.read()
+            if not ret:
+                break
+            packets += 1
+            total_bytes += packet.nbytes
+            timing.on_frame(cap, time.time())
+        elapsed = max(time.time() - started, 1e-6)
+        return {
+            'opened': True,
+            'raw': bool(raw),
+            'packets': packets,
+            'bitrate_kbps': total_bytes * 8 / elapsed / 1000.0,
+            'fps': timing.fps(),
+            'missing_frames': timing.missing_total
+        }
+    finally:
+        cap.release()
+
+
+class _CameraTier:
+    def __init__(self, settings, tier):
+        self.settings = settings
+        self.tier = tier
+        self.next_check = 0.0
+        self.in_flight = False
+        self.anomalies = 0  # Подряд идущих аномальных проверок
+        self.healthy = 0  # Подряд идущих здоровых проверок/статусов
+        self.connection_failures = 0  # Подряд идущих неудачных подключений
+        self.tier_since = time.time()
+        self.fps_baseline = None
+        self.bitrate_baseline = None
+        self.waiting_for_slot = False
+
+
+class TieredScheduler:
+    """
+    Планировщик уровней мониторинга. start_full/stop_full запускают и останавливают полный монитор
+    камеры, emit(event, data) публикует события (как socketio.emit), spawn запускает проверку
+    в фоне, run_blocking выполняет блокирующее чтение пакетов (tpool.execute на сервере).
+    Полный монитор сообщает о своем состоянии через observe(camera_id, event, data).
+    """
+
+    def __init__(self, start_full, stop_full, emit, spawn=None, run_blocking=None, max_full=16,
+                 probe_interval=30.0, sample_interval=30.0, sample_window=3.0,
+                 promote_after=2, demote_after=3, full_healthy_updates=30, full_min_sec=120.0,
+                 max_in_flight=32):
+        self.start_full = start_full
+        self.stop_full = stop_full
+        self.emit = emit
+        self.spawn = spawn or (lambda func, *args: threading.Thread(target=func, args=args, daemon=True).start())
+        self.run_blocking = run_blocking or (lambda func, *args: func(*args))
+        self.max_full = max_full  # Декодеров (уровень 2) на узел
+        self.probe_interval = probe_interval
+        self.sample_interval = sample_interval
+        self.sample_window = sample_window
+        self.promote_after = promote_after
+        self.demote_after = demote_after
+        self.full_healthy_updates = full_healthy_updates  # Здоровых status_update до понижения с уровня 2
+        self.full_min_sec = full_min_sec  # Минимум на уровне 2, чтобы не переключаться туда-обратно
+        self.max_in_flight = max_in_flight
+        self.cameras = {}
+        self._in_flight = 0
+        self._lock = threading.RLock()
+        self.running = False
+        self._generation = 0  # Цикл прошлого запуска завершается, даже если мониторинг сразу запущен снова
+
+    # Набор камер
+
+    def add(self, camera_id, settings):
+        """Новая камера начинает с уровня из настроек ('tier'), по умолчанию - с проверки доступности"""
+        tier = max(TIER_PROBE, min(TIER_FULL, int(settings.get('tier', TIER_PROBE))))
+        with self._lock:
+            self.cameras[camera_id] = _CameraTier(settings, TIER_PROBE)
+        if tier > TIER_PROBE:
+            self._set_tier(camera_id, tier, "уровень из настроек")
+
+    def remove(self, camera_id):
+        with self._lock:
+            state = self.cameras.pop(camera_id, None)
+        if state is not None and state.tier == TIER_FULL:
+            self.stop_full(camera_id, 'Камера удалена из конфигурации')
+
+    def update(self, camera_id, changes):
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is not None:
+                state.settings = dict(state.settings, **changes)
+
+    def stop_all(self):
+        self.running = False
+        self._generation += 1
+        with self._lock:
+            full = [camera_id for camera_id, state in self.cameras.items() if state.tier == TIER_FULL]
+            self.cameras.clear()
+        for camera_id in full:
+            self.stop_full(camera_id, 'Мониторинг остановлен')
+
+    def counts(self):
+        """Число камер на каждом уровне"""
+        with self._lock:
+            result = {tier: 0 for tier in TIER_NAMES}
+            for state in self.cameras.values():
+                result[state.tier] += 1
+            return result
+
+    # Цикл проверок
+
+    def run(self, tick=1.0):
+        """Запуск проверок по расписанию до stop_all()"""
+        self.running = True
+        generation = self._generation
+        while self.running and generation == self._generation:
+            self.check_due(time.time())
+            time.sleep(tick)
+
+    def check_due(self, now):
+        with self._lock:
+            due = [camera_id for camera_id, state in self.cameras.items()
+                   if state.tier != TIER_FULL and not state.in_flight and state.next_check <= now]
+            for camera_id in due:
+                if self._in_flight >= self.max_in_flight:
+                    break
+                self.cameras[camera_id].in_flight = True
+                self._in_flight += 1
+                self.spawn(self._check, camera_id)
+
+    def _check(self, camera_id):
+        tier = None
+        try:
+            with self._lock:
+                state = self.cameras.get(camera_id)
+                if state is None:
+                    return
+                tier, url = state.tier, state.settings['rtsp_url']
+            if tier == TIER_PROBE:
+                result = probe_source(url)
+                self._on_probe(camera_id, result)
+            elif tier == TIER_PACKETS:
+                result = self.run_blocking(sample_packets, url, self.sample_window)
+                self._on_packets(camera_id, result)
+        except Exception as e:
+            self._log(camera_id, f'ERROR: Проверка уровня не выполнена: {e}', 'error')
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                state = self.cameras.get(camera_id)
+                if state is not None:
+                    state.in_flight = False
+                    # После смены уровня камера проверяется сразу (next_check сброшен в _set_tier)
+                    if state.tier == tier:
+                        interval = self.probe_interval if tier == TIER_PROBE else self.sample_interval
+                        state.next_check = time.time() + interval
+
+    def _on_probe(self, camera_id, result):
+        # Без ответа RTSP камера недоступна; ответ с ошибкой (404, 503) - аномалия потока
+        connection_lost = not result['alive'] and result['status'] is None
+        anomaly = not result['alive'] and not connection_lost
+        self.emit('status_update', {
+            'cameraId': camera_id,
+            'tier': TIER_PROBE,
+            'connectionStatus': (f"Доступна (RTSP {result['status']})" if result['status'] else 'Доступна')
+            if result['alive'] else 'Недоступна',
+            'probeMs': result['rttMs'],
+            'alert': not result['alive']
+        })
+        if connection_lost:
+            self._log(camera_id, f"WARNING: Камера не отвечает на проверку: {result['error']}", 'warning')
+        elif anomaly:
+            self._log(camera_id, f"WARNING: Ошибка RTSP при проверке: {result['status']}", 'warning')
+        self._account(camera_id, anomaly, connection_lost)
+
+    def _on_packets(self, camera_id, result):
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return
+            threshold_ratio = float(state.settings.get('threshold_ratio', 0.3))
+            fps_baseline, bitrate_baseline = state.fps_baseline, state.bitrate_baseline
+        if not result.get('opened') or not result['packets']:
+            # Нет соединения - не повод для декодирования: алерт подключения на этом уровне
+            self.emit('status_update', {'cameraId': camera_id, 'tier': TIER_PACKETS, 'alert': True,
+                                        'connectionStatus': 'Нет потока'})
+            reason = 'поток не открывается' if not result.get('opened') else 'нет пакетов'
+            self._log(camera_id, f"WARNING: Нет подключения к потоку: {reason}", 'warning')
+            self._account(camera_id, False, connection_lost=True)
+            return
+        reasons = []
+        if result['fps'] < 5 or (fps_baseline and result['fps'] < fps_baseline * 0.5):
+            reasons.append(f"FPS {result['fps']:.1f}")
+        if bitrate_baseline and result['bitrate_kbps'] < bitrate_baseline * threshold_ratio:
+            reasons.append(f"битрейт {result['bitrate_kbps']:.0f}kbps")
+        if result['missing_frames']:
+            reasons.append(f"пропущено кадров: {result['missing_frames']}")
+        anomaly = bool(reasons)
+        if not anomaly:
+            # Норма камеры - по здоровым окнам (EWMA)
+            with self._lock:
+                state.fps_baseline = result['fps'] if fps_baseline is None else fps_baseline + 0.2 * (
+                    result['fps'] - fps_baseline)
+                state.bitrate_baseline = result['bitrate_kbps'] if bitrate_baseline is None else (
+                    bitrate_baseline + 0.2 * (result['bitrate_kbps'] - bitrate_baseline))
+        self.emit('status_update', {'cameraId': camera_id, 'tier': TIER_PACKETS, 'alert': anomaly,
+                                    'connectionStatus': 'Активно', 'bitrate': f"{result['bitrate_kbps']:.1f}",
+                                    'fps': f"{result['fps']:.1f}"})
+        if anomaly:
+            self._log(camera_id, f"WARNING: Аномалия потока: {', '.join(reasons)}", 'warning')
+        self._account(camera_id, anomaly)
+
+    def observe(self, camera_id, event, data):
+        """
+        Состояние полного монитора: здоровые статусы подряд опускают камеру на уровень пакетов,
+        неудачные переподключения подряд (статус без кадров, alert) - на проверку доступности.
+        """
+        if event != 'status_update' or 'alert' not in data:
+            return
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is None or state.tier != TIER_FULL:
+                return
+            if 'quality' not in data:
+                state.connection_failures = state.connection_failures + 1 if data['alert'] else 0
+                unreachable = state.connection_failures >= self.demote_after
+                demote = False
+            else:
+                state.connection_failures = 0
+                unreachable = False
+                healthy = not data['alert'] and data['quality'] in ('Хорошее', '--')
+                state.healthy = state.healthy + 1 if healthy else 0
+                demote = (state.healthy >= self.full_healthy_updates
+                          and time.time() - state.tier_since >= self.full_min_sec)
+        if unreachable:
+            self._set_tier(camera_id, TIER_PROBE, "нет подключения, декодер освобожден")
+        elif demote:
+            self._set_tier(camera_id, TIER_PACKETS, "поток снова в норме")
+
+    # Переходы между уровнями
+
+    def _account(self, camera_id, anomaly, connection_lost=False):
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return
+            if connection_lost:
+                # Недоступная камера не повышается: декодер ей не поможет
+                state.connection_failures += 1
+                state.anomalies = 0
+                state.healthy = 0
+            elif anomaly:
+                state.connection_failures = 0
+                state.anomalies += 1
+                state.healthy = 0
+            else:
+                state.connection_failures = 0
+                state.healthy += 1
+                state.anomalies = 0
+            tier = state.tier
+            promote = state.anomalies >= self.promote_after
+            demote = tier > TIER_PROBE and state.healthy >= self.demote_after
+            unreachable = tier > TIER_PROBE and state.connection_failures >= self.demote_after
+        if promote:
+            self._set_tier(camera_id, tier + 1, "аномалия")
+        elif unreachable:
+            self._set_tier(camera_id, TIER_PROBE, "нет подключения")
+        elif demote:
+            self._set_tier(camera_id, tier - 1, "камера в норме")
+
+    def _set_tier(self, camera_id, tier, reason):
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is None or state.tier == tier:
+                return
+            if tier == TIER_FULL:
+                full = sum(1 for s in self.cameras.values() if s.tier == TIER_FULL)
+                if full >= self.max_full:
+                    # Нет свободного декодера: камера остается на уровне пакетов и проверяется снова
+                    if not state.waiting_for_slot:
+                        state.waiting_for_slot = True
+                        self._log(camera_id, f'WARNING: Нет свободных декодеров ({self.max_full}), '
+                                             f'полный анализ отложен', 'warning')
+                    state.anomalies = 0
+                    return
+            previous = state.tier
+            state.tier = tier
+            state.tier_since = time.time()
+            state.anomalies = 0
+            state.healthy = 0
+            state.connection_failures = 0
+            state.waiting_for_slot = False
+            # Новый уровень проверяет камеру сразу
+            state.next_check = 0.0
+            settings = state.settings
+        direction = 'повышен' if tier > previous else 'понижен'
+        self._log(camera_id, f"INFO: Уровень мониторинга {direction}: {TIER_NAMES[previous]} -> "
+                             f"{TIER_NAMES[tier]} ({reason})", 'warning' if tier > previous else 'info')
+        if tier == TIER_FULL:
+            self.start_full(camera_id, settings)
+        elif previous == TIER_FULL:
+            self.stop_full(camera_id, 'Полный анализ завершен: камера в норме')
+
+    def _log(self, camera_id, message, level='info'):
+        self.emit('log_entry', {
+            'cameraId': camera_id,
+            'message': message,
+            'type': level,
+            'time': datetime.now().strftime('%H:%M:%S')
+        })
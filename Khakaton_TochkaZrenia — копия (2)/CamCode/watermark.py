@@ -0,0 +1,101 @@
+import functools
+
+import numpy as np
+
+# Пиксельная метка кадра: номер кадра, время отправки и флаг неисправности.
+# Биты - черные/белые квадраты в верхних строках кадра, размер клетки кратен 8,
+# чтобы метка переживала JPEG-сжатие эмулятора даже при низком качестве.
+CELL_PX = 16
+BASE_WIDTH = 1280
+SYNC = 0b10110010
+SEQ_BITS = 32
+TS_BITS = 48
+FLAG_BITS = 8
+CHECK_BITS = 16
+TOTAL_BITS = 8 + SEQ_BITS + TS_BITS + FLAG_BITS + CHECK_BITS
+
+FLAG_FAULT = 0x01
+
+
+def _checksum(sequence, timestamp_ms, flags):
+    """Контрольная сумма полей метки (16 бит)"""
+    value = (sequence * 2654435761 + timestamp_ms * 40503 + flags * 97) & 0xFFFFFFFFFFFF
+    return (value ^ (value >> 16) ^ (value >> 32)) & 0xFFFF
+
+
+def _to_bits(value, count):
+    return [(value >> (count - 1 - i)) & 1 for i in range(count)]
+
+
+def _from_bits(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _cell_size(width):
+    """Размер клетки метки для кадра ширины width"""
+    return max(1, int(round(CELL_PX * width / BASE_WIDTH)))
+
+
+@functools.lru_cache(maxsize=8)
+def _cell_positions(width):
+    """Центры клеток метки для кадра ширины width"""
+    cell = _cell_size(width)
+    per_row = width // cell
+    ys = []
+    xs = []
+    for i in range(TOTAL_BITS):
+        row, col = divmod(i, per_row)
+        ys.append(int((row + 0.5) * cell))
+        xs.append(int((col + 0.5) * cell))
+    return np.array(ys), np.array(xs)
+
+
+def encode_watermark(image, sequence, timestamp_ms, fault=False):
+    """Нанесение метки на BGR-изображение (in-place)"""
+    flags = FLAG_FAULT if fault else 0
+    sequence &= 0xFFFFFFFF
+    timestamp_ms &= 0xFFFFFFFFFFFF
+    bits = (_to_bits(SYNC, 8) + _to_bits(sequence, SEQ_BITS) + _to_bits(timestamp_ms, TS_BITS)
+            + _to_bits(flags, FLAG_BITS) + _to_bits(_checksum(sequence, timestamp_ms, flags), CHECK_BITS))
+    cell = _cell_size(image.shape[1])
+    per_row = image.shape[1] // cell
+    for i, bit in enumerate(bits):
+        row, col = divmod(i, per_row)
+        y = row * cell
+        x = col * cell
+        image[y:y + cell, x:x + cell] = 255 if bit else 0
+    return image
+
+
+def decode_watermark(frame):
+    """
+    Чтение метки из кадра.
+    Возвращает {'sequence', 'timestamp_ms', 'fault'} или None, если метки нет.
+    """
+    if frame is None or frame.ndim < 2:
+        return None
+    ys, xs = _cell_positions(frame.shape[1])
+    samples = frame[ys, xs]
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    bits = samples > 127
+
+    if _from_bits(bits[:8]) != SYNC:
+        return None
+    pos = 8
+    sequence = _from_bits(bits[pos:pos + SEQ_BITS])
+    pos += SEQ_BITS
+    timestamp_ms = _from_bits(bits[pos:pos + TS_BITS])
+    pos += TS_BITS
+    flags = _from_bits(bits[pos:pos + FLAG_BITS])
+    pos += FLAG_BITS
+    if _from_bits(bits[pos:pos + CHECK_BITS]) != _checksum(sequence, timestamp_ms, flags):
+        return None
+    return {
+        'sequence': sequence,
+        'timestamp_ms': timestamp_ms,
+        'fault': bool(flags & FLAG_FAULT)
+    }
@@ -3,78 +3,161 @@ import time
 import random
 import math
 import os
+import re
+import sys
+import asyncio
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+
+# Общие модули мониторов (пиксельная метка кадра)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CamCode'))
+
+# OpenCV/NumPy нужны только для отдачи кадров по HTTP (--serve)
+try:
+    import cv2
+    import numpy as np
+    from watermark import encode_watermark
+except ImportError:
+    cv2 = None
+    np = None
+
+from quantiles import StreamingQuantiles
 
 class TextGraphics:
     """
-    Графика для текстового режима
+    Графика для текстового режима.
+    Рамки и полосы индикаторов строятся один раз на размер, кадры берут готовые строки.
     """
     
+    _boxes: Dict[tuple, List[str]] = {}
+    _bars: Dict[int, List[str]] = {}
+    
     @staticmethod
     def create_box(width: int, height: int, title: str = "") -> List[str]:
-        """Создает текстовое окно с рамкой"""
-        lines = []
-        # Верхняя граница
-        lines.append("┌" + "─" * (width - 2) + "┐")
-        
-        # Заголовок
-        if title:
-            title_line = f"│ {title:<{width-4}} │"
-            lines.append(title_line)
-            lines.append("├" + "─" * (width - 2) + "┤")
-        
-        # Пустые строки
-        for _ in range(height - 3 - (1 if title else 0)):
-            lines.append("│" + " " * (width - 2) + "│")
-        
-        # Нижняя граница
-        lines.append("└" + "─" * (width - 2) + "┘")
-        return lines
+        """Создает текстовое окно с рамкой (копия шаблона, который можно менять)"""
+        key = (width, height, title)
+        box = TextGraphics._boxes.get(key)
+        if box is None:
+            box = []
+            # Верхняя граница
+            box.append("┌" + "─" * (width - 2) + "┐")
+            
+            # Заголовок
+            if title:
+                title_line = f"│ {title:<{width-4}} │"
+                box.append(title_line)
+                box.append("├" + "─" * (width - 2) + "┤")
+            
+            # Пустые строки
+            for _ in range(height - 3 - (1 if title else 0)):
+                box.append("│" + " " * (width - 2) + "│")
+            
+            # Нижняя граница
+            box.append("└" + "─" * (width - 2) + "┘")
+            TextGraphics._boxes[key] = box
+        return list(box)
     
     @staticmethod
     def draw_meter(value: float, max_value: float = 100.0, label: str = "", width: int = 50) -> str:
         """Рисует текстовый индикатор"""
         bar_width = width - 25
         filled = int((value / max_value) * bar_width)
-        bar = "[" + "█" * filled + "░" * (bar_width - filled) + "]"
+        bars = TextGraphics._bars.get(bar_width)
+        if bars is None:
+            # Полоса для каждого уровня заполнения
+            bars = ["[" + "█" * level + "░" * (bar_width - level) + "]" for level in range(bar_width + 1)]
+            TextGraphics._bars[bar_width] = bars
+        if 0 <= filled <= bar_width:
+            bar = bars[filled]
+        else:
+            # Значение вне шкалы - полоса выходит за ее границы, как и раньше
+            bar = "[" + "█" * filled + "░" * (bar_width - filled) + "]"
         return f"{label:<15} {bar} {value:>6.1f}"
 
+class WallClock:
+    """
+    Реальное время
+    """
+    
+    def time(self) -> float:
+        return time.time()
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+class VirtualClock:
+    """
+    Виртуальное время для режима симуляции: sleep только сдвигает часы
+    """
+    
+    def __init__(self, start_time: float = 1700000000.0):
+        self.now = start_time
+    
+    def time(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+
 class NetworkEffects:
     """
     Сетевые эффекты
     """
     
     @staticmethod
-    def apply_network_effects(packet_loss_rate: float, latency_ms: float, jitter_ms: float, freeze_probability: float) -> Dict:
-        """Применение сетевых эффектов"""
+    def roll_network_effects(packet_loss_rate: float, latency_ms: float, jitter_ms: float, freeze_probability: float,
+                             rng=random) -> Dict:
+        """Расчет сетевых эффектов без ожидания (задержки возвращаются в 'delay_sec')"""
         effects = {
             'packet_lost': False,
             'actual_latency': 0.0,
             'freeze_occurred': False,
-            'frame_skipped': False
+            'frame_skipped': False,
+            'delay_sec': 0.0
         }
         
         # Эмуляция потерь пакетов
-        if random.random() < packet_loss_rate:
+        if rng.random() < packet_loss_rate:
             effects['packet_lost'] = True
             return effects
         
         # Эмуляция задержки
-        effects['actual_latency'] = latency_ms + random.uniform(-jitter_ms, jitter_ms)
-        time.sleep(max(0, effects['actual_latency']) / 1000.0)
+        effects['actual_latency'] = latency_ms + rng.uniform(-jitter_ms, jitter_ms)
+        effects['delay_sec'] = max(0, effects['actual_latency']) / 1000.0
         
         # Эмуляция пропуска кадра
-        if random.random() < packet_loss_rate * 2:
+        if rng.random() < packet_loss_rate * 2:
             effects['frame_skipped'] = True
         
         # Эмуляция фриза
-        if random.random() < freeze_probability:
-            freeze_time = random.uniform(0.05, 0.5)
-            time.sleep(freeze_time)
+        if rng.random() < freeze_probability:
+            effects['delay_sec'] += rng.uniform(0.05, 0.5)
             effects['freeze_occurred'] = True
         
         return effects
+    
+    @staticmethod
+    def apply_network_effects(packet_loss_rate: float, latency_ms: float, jitter_ms: float, freeze_probability: float,
+                              rng=random, clock=None) -> Dict:
+        """Применение сетевых эффектов (с VirtualClock задержки только сдвигают время)"""
+        effects = NetworkEffects.roll_network_effects(packet_loss_rate, latency_ms, jitter_ms, freeze_probability, rng)
+        if effects['delay_sec'] > 0:
+            (clock or WallClock()).sleep(effects['delay_sec'])
+        return effects
+    
+    @staticmethod
+    async def apply_network_effects_async(packet_loss_rate: float, latency_ms: float, jitter_ms: float, freeze_probability: float,
+                                          rng=random) -> Dict:
+        """Применение сетевых эффектов без блокировки event loop"""
+        effects = NetworkEffects.roll_network_effects(packet_loss_rate, latency_ms, jitter_ms, freeze_probability, rng)
+        if effects['delay_sec'] > 0:
+            await asyncio.sleep(effects['delay_sec'])
+        return effects
 
 class CameraEmulator720p:
     """
@@ -82,7 +165,8 @@ class CameraEmulator720p:
     """
     
     def __init__(self, actual_width: int = 1280, actual_height: int = 720, target_fps: int = 25,
-                 text_width: int = 80, text_height: int = 24):
+                 text_width: int = 80, text_height: int = 24, quiet: bool = False,
+                 seed: Optional[int] = None, clock=None):
         
         # Реальное разрешение камеры
         self.actual_width = actual_width
@@ -96,6 +180,16 @@ class CameraEmulator720p:
         self.is_running = False
         self.frame_count = 0
         self.start_time = 0
+        # Время начала текущего кадра и флаг неисправности (для метки кадра)
+        self.frame_timestamp = 0.0
+        self.fault_active = False
+        # Без вывода в консоль (для хоста с сотнями эмуляторов)
+        self.quiet = quiet
+        
+        # Часы и генератор случайных чисел (seed - воспроизводимый прогон)
+        self.clock = clock or WallClock()
+        self.rng = random.Random(seed) if seed is not None else random
+        self.simulation = isinstance(self.clock, VirtualClock)
         
         # Параметры сети для 720p
         self.network_params = {
@@ -107,21 +201,16 @@ class CameraEmulator720p:
         }
         
         # Статистика
-        self.stats = {
-            'frames_generated': 0,
-            'frames_displayed': 0,
-            'frames_lost': 0,
-            'frames_skipped': 0,
-            'total_latency': 0.0,
-            'freezes_detected': 0,
-            'start_time': 0,
-            'min_fps': float('inf'),
-            'max_fps': 0,
-        }
+        self._reset_stats(0)
         
         self.current_pattern = "stream_info"
         self.patterns = ["stream_info", "network_monitor", "quality_meter", "simple_visual"]
+        # Шаблоны кадров: неизменная часть кадра паттерна (рамка, заголовки, подписи)
+        self._templates: Dict[tuple, List[str]] = {}
+        self._graph_line = (None, "")  # (первая точка, строка) графика network_monitor
         
+        if self.quiet:
+            return
         print("🎥 Эмулятор камеры 1280×720 инициализирован")
         print(f"📏 Разрешение: {actual_width}×{actual_height}")
         print(f"🎞️  Целевой FPS: {target_fps}")
@@ -144,6 +233,9 @@ class CameraEmulator720p:
             'bitrate_kbps': max(500, bitrate_kbps),
         }
         
+        if self.quiet:
+            return
+        
         print("\n🔧 Параметры сети установлены:")
         print(f"   📉 Потери пакетов: {packet_loss}%")
         print(f"   ⏱️  Задержка: {latency_ms}ms")
@@ -160,6 +252,40 @@ class CameraEmulator720p:
         else:
             print(f"   ✅ Битрейт в норме. Рекомендация: {recommended['optimal']} kbps")
     
+    def enable_simulation(self, seed: int = 0, start_time: float = 1700000000.0):
+        """
+        Режим симуляции: виртуальное время и детерминированный RNG.
+        Задержки, джиттер и фризы сдвигают виртуальные часы вместо sleep,
+        кадры не выводятся на экран - час работы камеры считается за секунды.
+        """
+        self.clock = VirtualClock(start_time)
+        self.rng = random.Random(seed)
+        self.simulation = True
+    
+    def _reset_stats(self, start_time: float):
+        """Сброс статистики потока"""
+        self.stats = {
+            'frames_generated': 0,
+            'frames_displayed': 0,
+            'frames_lost': 0,
+            'frames_skipped': 0,
+            'total_latency': 0.0,
+            'freezes_detected': 0,
+            'start_time': start_time,
+            'min_fps': float('inf'),
+            'max_fps': 0,
+        }
+        # Распределения задержки и мгновенного FPS: постоянная память при любой длительности
+        self.latency_quantiles = StreamingQuantiles()
+        self.fps_quantiles = StreamingQuantiles((0.01, 0.05, 0.5, 0.95, 0.99))
+        self.last_frame_time = None
+    
+    def _account_frame_time(self, now: float):
+        """Мгновенный FPS по интервалу между отображенными кадрами"""
+        if self.last_frame_time is not None and now > self.last_frame_time:
+            self.fps_quantiles.add(1.0 / (now - self.last_frame_time))
+        self.last_frame_time = now
+    
     def _get_recommended_bitrate(self) -> Dict:
         """Рекомендованные битрейты для 720p"""
         return {
@@ -172,7 +298,8 @@ class CameraEmulator720p:
         """Установка паттерна отображения"""
         if pattern in self.patterns:
             self.current_pattern = pattern
-            print(f"🎨 Установлен паттерн: {pattern}")
+            if not self.quiet:
+                print(f"🎨 Установлен паттерн: {pattern}")
         else:
             print(f"❌ Неизвестный паттерн. Доступные: {', '.join(self.patterns)}")
     
@@ -180,44 +307,66 @@ class CameraEmulator720p:
         """Очистка экрана"""
         os.system('cls' if os.name == 'nt' else 'clear')
     
+    def _template(self, key: tuple, build: Callable[[], List[str]]) -> List[str]:
+        """Копия шаблона кадра; шаблон строится при первом обращении"""
+        template = self._templates.get(key)
+        if template is None:
+            template = build()
+            self._templates[key] = template
+        return list(template)
+    
+    def _box_line(self, text: str) -> str:
+        return f"│ {text:<{self.text_width-4}} │"
+    
     def _generate_stream_info_frame(self) -> List[str]:
         """Генерация кадра с информацией о потоке"""
-        lines = TextGraphics.create_box(self.text_width, self.text_height, 
-                                      "🎥 720p VIDEO STREAM")
+        def build() -> List[str]:
+            box = TextGraphics.create_box(self.text_width, self.text_height, "🎥 720p VIDEO STREAM")
+            static_lines = {
+                2: f"Resolution: {self.actual_width}×{self.actual_height}",
+                3: f"FPS: {self.target_fps}",
+                4: f"Pattern: {self.current_pattern}",
+                5: "",
+                6: "📊 СЕТЕВЫЕ ПАРАМЕТРЫ:",
+                12: "",
+                13: "🎯 КАЧЕСТВО ПОТОКА:",
+            }
+            for i, info in static_lines.items():
+                if i + 2 < len(box):
+                    box[i + 2] = self._box_line(info)
+            return box
+        
+        lines = self._template(('stream_info', self.text_width, self.text_height, self.current_pattern), build)
         
         # Расчет качества
         quality_score = self._calculate_quality_score()
         
-        # Основная информация
-        info_lines = [
-            f"Frame: {self.frame_count:06d}",
-            f"Time: {datetime.now().strftime('%H:%M:%S')}",
-            f"Resolution: {self.actual_width}×{self.actual_height}",
-            f"FPS: {self.target_fps}",
-            f"Pattern: {self.current_pattern}",
-            "",
-            "📊 СЕТЕВЫЕ ПАРАМЕТРЫ:",
-            f"  Bitrate:     {self.network_params['bitrate_kbps']:5d} kbps",
-            f"  Packet Loss: {self.network_params['packet_loss']*100:5.2f}%",
-            f"  Latency:     {self.network_params['latency_ms']:5.1f}ms",
-            f"  Jitter:     ±{self.network_params['jitter_ms']:4.1f}ms",
-            f"  Freeze Prob: {self.network_params['freeze_probability']*100:5.2f}%",
-            "",
-            "🎯 КАЧЕСТВО ПОТОКА:",
-            f"  Score: {quality_score:.1f}/100",
-            f"  Status: {self._get_quality_status(quality_score)}",
-        ]
+        # Меняющиеся поля (номер строки информации -> текст), остальное уже в шаблоне
+        params = self.network_params
+        info_lines = (
+            (0, f"Frame: {self.frame_count:06d}"),
+            (1, f"Time: {datetime.fromtimestamp(self.clock.time()).strftime('%H:%M:%S')}"),
+            (7, f"  Bitrate:     {params['bitrate_kbps']:5d} kbps"),
+            (8, f"  Packet Loss: {params['packet_loss']*100:5.2f}%"),
+            (9, f"  Latency:     {params['latency_ms']:5.1f}ms"),
+            (10, f"  Jitter:     ±{params['jitter_ms']:4.1f}ms"),
+            (11, f"  Freeze Prob: {params['freeze_probability']*100:5.2f}%"),
+            (14, f"  Score: {quality_score:.1f}/100"),
+            (15, f"  Status: {self._get_quality_status(quality_score)}"),
+        )
         
         # Заполняем информацией
-        for i, info in enumerate(info_lines):
+        for i, info in info_lines:
             if i + 2 < len(lines):
-                lines[i + 2] = f"│ {info:<{self.text_width-4}} │"
+                lines[i + 2] = self._box_line(info)
         
         # Анимированный элемент
-        anim_pos = (self.frame_count * 2) % (self.text_width - 10)
-        anim_line = "  " + " " * anim_pos + "███" + " " * (self.text_width - anim_pos - 15)
         if len(lines) > self.text_height - 2:
-            lines[self.text_height - 2] = f"│{anim_line}│"
+            anim_lines = self._template(('stream_info_anim', self.text_width), lambda: [
+                "│  " + " " * pos + "███" + " " * (self.text_width - pos - 15) + "│"
+                for pos in range(self.text_width - 10)
+            ])
+            lines[self.text_height - 2] = anim_lines[(self.frame_count * 2) % (self.text_width - 10)]
         
         return lines
     
@@ -243,15 +392,9 @@ class CameraEmulator720p:
             if i + 2 < len(lines):
                 lines[i + 2] = f"│ {indicator} │"
         
-        # Простой график качества
+        # Простой график качества: окно бегущей последовательности, сдвигается на точку за кадр
         if len(lines) > self.text_height - 3:
-            graph_line = "│ "
-            for i in range(self.text_width - 4):
-                time_point = (self.frame_count + i) * 0.1
-                value = 50 + 40 * math.sin(time_point * 0.3)
-                graph_line += "█" if value > 70 else "░"
-            graph_line += " │"
-            lines[self.text_height - 3] = graph_line
+            lines[self.text_height - 3] = "│ " + self._graph_points(self.frame_count, self.text_width - 4) + " │"
         
         # Статус
         status = self._get_quality_status(quality_score)
@@ -261,6 +404,24 @@ class CameraEmulator720p:
         
         return lines
     
+    @staticmethod
+    def _graph_point(index: int) -> str:
+        time_point = index * 0.1
+        value = 50 + 40 * math.sin(time_point * 0.3)
+        return "█" if value > 70 else "░"
+    
+    def _graph_points(self, start: int, width: int) -> str:
+        """Точки графика start..start+width-1; при сдвиге на кадр считается одна новая точка"""
+        last_start, points = self._graph_line
+        if last_start == start and len(points) == width:
+            return points
+        if last_start == start - 1 and len(points) == width:
+            points = points[1:] + self._graph_point(start + width - 1)
+        else:
+            points = "".join(self._graph_point(start + i) for i in range(width))
+        self._graph_line = (start, points)
+        return points
+    
     def _generate_quality_meter_frame(self) -> List[str]:
         """Измеритель качества потока"""
         lines = TextGraphics.create_box(self.text_width, self.text_height, 
@@ -304,33 +465,31 @@ class CameraEmulator720p:
         lines = TextGraphics.create_box(self.text_width, self.text_height, 
                                       "🔲 720p VIDEO PREVIEW")
         
-        # Создаем простую анимацию
+        # Движущийся паттерн sin(10x + t)/2 + 0.3cos(8y + 1.3t) + sin(15(x + y) + 0.7t)/5.
+        # Последнее слагаемое раскладывается как sin(a + b): тригонометрия считается
+        # по столбцам и строкам (W + H вызовов), а не для каждой клетки кадра
+        xs, ys = self._template(('simple_visual_grid', self.text_width, self.text_height), lambda: [
+            [col / (self.text_width - 2) for col in range(1, self.text_width - 1)],
+            [row / (self.text_height - 2) for row in range(self.text_height)],
+        ])
+        time_val = self.frame_count * 0.2
+        column_terms = [(math.sin(x * 10 + time_val) * 0.5,
+                         math.sin(x * 15 + time_val * 0.7) * 0.2,
+                         math.cos(x * 15 + time_val * 0.7) * 0.2) for x in xs]
         for row in range(2, self.text_height - 1):
             if row < len(lines):
-                visual_line = ""
-                for col in range(1, self.text_width - 1):
-                    # Создаем движущийся паттерн
-                    x = col / (self.text_width - 2)
-                    y = row / (self.text_height - 2)
-                    
-                    time_val = self.frame_count * 0.2
-                    pattern1 = math.sin(x * 10 + time_val) * 0.5
-                    pattern2 = math.cos(y * 8 + time_val * 1.3) * 0.3
-                    pattern3 = math.sin((x + y) * 15 + time_val * 0.7) * 0.2
-                    
-                    combined = pattern1 + pattern2 + pattern3
-                    
-                    if combined > 0.6:
-                        visual_line += "█"
-                    elif combined > 0.2:
-                        visual_line += "▓"
-                    elif combined > -0.2:
-                        visual_line += "▒"
-                    elif combined > -0.6:
-                        visual_line += "░"
-                    else:
-                        visual_line += " "
-                
+                y = ys[row]
+                pattern2 = math.cos(y * 8 + time_val * 1.3) * 0.3
+                sin_y = math.sin(y * 15)
+                cos_y = math.cos(y * 15)
+                visual_line = "".join([
+                    "█" if combined > 0.6 else
+                    "▓" if combined > 0.2 else
+                    "▒" if combined > -0.2 else
+                    "░" if combined > -0.6 else " "
+                    for combined in [pattern1 + pattern2 + (sin_x * cos_y + cos_x * sin_y)
+                                     for pattern1, sin_x, cos_x in column_terms]
+                ])
                 lines[row] = f"│{visual_line}│"
         
         # Информация
@@ -383,22 +542,47 @@ class CameraEmulator720p:
             self.network_params['packet_loss'],
             self.network_params['latency_ms'], 
             self.network_params['jitter_ms'],
-            self.network_params['freeze_probability']
+            self.network_params['freeze_probability'],
+            self.rng,
+            self.clock
         )
         
+        if not self._account_effects(effects):
+            return None
+        return self._render_frame()
+    
+    async def generate_frame_async(self, render: bool = True) -> Optional[List[str]]:
+        """Генерация кадра с ожиданием сетевых эффектов через asyncio"""
+        effects = await NetworkEffects.apply_network_effects_async(
+            self.network_params['packet_loss'],
+            self.network_params['latency_ms'], 
+            self.network_params['jitter_ms'],
+            self.network_params['freeze_probability'],
+            self.rng
+        )
+        
+        if not self._account_effects(effects):
+            return None
+        return self._render_frame() if render else []
+    
+    def _account_effects(self, effects: Dict) -> bool:
+        """Учет сетевых эффектов в статистике; False - кадр потерян"""
         if effects['packet_lost']:
             self.stats['frames_lost'] += 1
-            return None
+            return False
         
         if effects['frame_skipped']:
             self.stats['frames_skipped'] += 1
         
         self.stats['total_latency'] += effects['actual_latency']
+        self.latency_quantiles.add(effects['actual_latency'])
         
         if effects['freeze_occurred']:
             self.stats['freezes_detected'] += 1
-        
-        # Генерация кадра
+        return True
+    
+    def _render_frame(self) -> List[str]:
+        """Генерация кадра текущего паттерна"""
         if self.current_pattern == "stream_info":
             return self._generate_stream_info_frame()
         elif self.current_pattern == "network_monitor":
@@ -421,7 +605,7 @@ class CameraEmulator720p:
         if self.stats['frames_displayed'] == 0:
             return self.stats
         
-        elapsed = time.time() - self.stats['start_time']
+        elapsed = self.clock.time() - self.stats['start_time']
         current_fps = self.stats['frames_displayed'] / elapsed
         
         # Обновляем min/max FPS
@@ -441,6 +625,8 @@ class CameraEmulator720p:
             'min_fps': self.stats['min_fps'],
             'max_fps': self.stats['max_fps'],
             'fps_stability': (current_fps / self.target_fps) * 100,
+            'fps_quantiles': self.fps_quantiles.summary(2),
+            'latency_quantiles': self.latency_quantiles.summary(),
             'quality_score': quality_score,
             'quality_status': self._get_quality_status(quality_score),
             'elapsed_time': elapsed
@@ -454,48 +640,50 @@ class CameraEmulator720p:
         
         self.is_running = True
         self.frame_count = 0
-        self.stats = {
-            'frames_generated': 0,
-            'frames_displayed': 0,
-            'frames_lost': 0,
-            'frames_skipped': 0,
-            'total_latency': 0.0,
-            'freezes_detected': 0,
-            'start_time': time.time(),
-            'min_fps': float('inf'),
-            'max_fps': 0,
-        }
+        self._reset_stats(self.clock.time())
         
-        print(f"\n🎥 Запуск потока 1280×720 @ {self.target_fps}FPS")
-        print(f"⏱️  Длительность: {duration} секунд")
-        print("⏹️  Для остановки нажмите Ctrl+C")
-        time.sleep(1)
+        if not self.quiet:
+            print(f"\n🎥 Запуск потока 1280×720 @ {self.target_fps}FPS")
+            print(f"⏱️  Длительность: {duration} секунд")
+            if self.simulation:
+                print("🧪 Режим симуляции: виртуальное время")
+            else:
+                print("⏹️  Для остановки нажмите Ctrl+C")
+        if not self.simulation:
+            time.sleep(1)
         
-        end_time = time.time() + duration
+        end_time = self.clock.time() + duration
         
         try:
-            while self.is_running and time.time() < end_time:
-                frame_start = time.time()
-                self.stats['frames_generated'] += 1
-                
-                # Генерируем и отображаем кадр
-                frame = self.generate_frame()
-                if frame is not None:
-                    self.display_frame(frame)
-                    self.stats['frames_displayed'] += 1
-                    self.frame_count += 1
-                
-                # Поддержание FPS
-                frame_time = time.time() - frame_start
-                target_frame_time = 1.0 / self.target_fps
-                sleep_time = max(0, target_frame_time - frame_time)
-                time.sleep(sleep_time)
-                
+            self._stream_loop(end_time, None if self.simulation else self.display_frame)
         except KeyboardInterrupt:
             print("\n🛑 Остановка по запросу пользователя")
         finally:
             self.is_running = False
-            self._show_stats()
+            if not self.quiet:
+                self._show_stats()
+    
+    def _stream_loop(self, end_time: float, on_frame: Optional[Callable[[List[str]], None]] = None):
+        """Цикл генерации кадров до end_time (по часам эмулятора)"""
+        while self.is_running and self.clock.time() < end_time:
+            frame_start = self.clock.time()
+            self.frame_timestamp = frame_start
+            self.stats['frames_generated'] += 1
+            
+            # Генерируем и отображаем кадр
+            frame = self.generate_frame()
+            if frame is not None:
+                if on_frame:
+                    on_frame(frame)
+                self.stats['frames_displayed'] += 1
+                self._account_frame_time(self.clock.time())
+                self.frame_count += 1
+            
+            # Поддержание FPS
+            frame_time = self.clock.time() - frame_start
+            target_frame_time = 1.0 / self.target_fps
+            sleep_time = max(0, target_frame_time - frame_time)
+            self.clock.sleep(sleep_time)
     
     def _show_stats(self):
         """Показать статистику"""
@@ -512,10 +700,595 @@ class CameraEmulator720p:
         print(f"❄️  Фризов: {stats['freezes_detected']}")
         print(f"🎞️  FPS: {stats['current_fps']:.2f}")
         print(f"📈 Min/Max FPS: {stats['min_fps']:.2f}/{stats['max_fps']:.2f}")
+        if stats['fps_quantiles']:
+            q = stats['fps_quantiles']
+            print(f"📉 FPS кадра p1/p5/p50: {q['p1']:.2f}/{q['p5']:.2f}/{q['p50']:.2f}")
+        if stats['latency_quantiles']:
+            q = stats['latency_quantiles']
+            print(f"⏱️  Задержка p50/p95/p99: {q['p50']:.1f}/{q['p95']:.1f}/{q['p99']:.1f}ms")
         print(f"🎯 Качество: {stats['quality_score']:.1f}/100")
         print(f"🏆 Статус: {stats['quality_status']}")
         print("=" * 50)
 
+class ScenarioRunner:
+    """
+    Сценарий сетевых условий: таймлайн фаз, прогон без интерфейса и JSON-отчет
+    """
+    
+    # Параметры сети по умолчанию (в единицах set_network_parameters)
+    DEFAULT_NETWORK = {
+        'packet_loss': 0.1,
+        'latency_ms': 15.0,
+        'jitter_ms': 3.0,
+        'freeze_probability': 0.1,
+        'bitrate_kbps': 2500,
+    }
+    
+    def __init__(self, emulator: CameraEmulator720p, scenario: Dict):
+        self.emulator = emulator
+        self.scenario = scenario
+        self.phases = self._build_phases(scenario)
+    
+    @staticmethod
+    def load(path: str) -> Dict:
+        """Загрузка сценария из JSON или YAML"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.lower().endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError("Для YAML-сценариев установите PyYAML: pip install pyyaml")
+                return yaml.safe_load(f)
+            return json.load(f)
+    
+    def _build_phases(self, scenario: Dict) -> List[Dict]:
+        """
+        Фазы: {"at": секунда начала, "name": ..., "network": {...}, "pattern": ..., "fault": bool}.
+        Параметры сети накапливаются - фаза меняет только указанные значения.
+        "fault" помечает фазу как неисправность (флаг в метке кадра для замера задержки алерта).
+        """
+        raw_phases = sorted(scenario.get('phases', []), key=lambda phase: float(phase.get('at', 0)))
+        if not raw_phases:
+            raise ValueError("Сценарий не содержит фаз")
+        if float(raw_phases[0].get('at', 0)) > 0:
+            raw_phases.insert(0, {'at': 0, 'name': 'initial'})
+        
+        duration = float(scenario.get('duration', float(raw_phases[-1].get('at', 0)) + 30))
+        network = dict(self.DEFAULT_NETWORK)
+        pattern = scenario.get('pattern', 'stream_info')
+        phases = []
+        for i, raw in enumerate(raw_phases):
+            unknown = set(raw.get('network', {})) - set(self.DEFAULT_NETWORK)
+            if unknown:
+                raise ValueError(f"Неизвестные параметры сети в фазе {i}: {', '.join(sorted(unknown))}")
+            network.update(raw.get('network', {}))
+            pattern = raw.get('pattern', pattern)
+            fault = bool(raw.get('fault', False))
+            start = float(raw.get('at', 0))
+            end = float(raw_phases[i + 1].get('at', 0)) if i + 1 < len(raw_phases) else duration
+            if end <= start:
+                continue
+            phases.append({
+                'name': raw.get('name', f"phase_{i}"),
+                'start': start,
+                'end': end,
+                'network': dict(network),
+                'pattern': pattern,
+                'fault': fault,
+            })
+        return phases
+    
+    def run(self, on_frame: Optional[Callable[[List[str]], None]] = None) -> Dict:
+        """Прогон всех фаз; статистика get_statistics собирается по каждой фазе"""
+        emulator = self.emulator
+        report = {
+            'scenario': self.scenario.get('name', 'scenario'),
+            'simulation': emulator.simulation,
+            'seed': self.scenario.get('seed'),
+            'started_at': datetime.fromtimestamp(emulator.clock.time()).isoformat(),
+            'phases': []
+        }
+        
+        emulator.is_running = True
+        emulator.frame_count = 0
+        scenario_start = emulator.clock.time()
+        try:
+            for phase in self.phases:
+                if not emulator.is_running:
+                    break
+                emulator.set_network_parameters(**phase['network'])
+                emulator.set_display_pattern(phase['pattern'])
+                emulator.fault_active = phase['fault']
+                emulator._reset_stats(emulator.clock.time())
+                if not emulator.quiet:
+                    print(f"▶️  Фаза '{phase['name']}' ({phase['start']:.0f}-{phase['end']:.0f}s)")
+                
+                emulator._stream_loop(scenario_start + phase['end'], on_frame)
+                
+                report['phases'].append({
+                    'name': phase['name'],
+                    'start': phase['start'],
+                    'end': phase['end'],
+                    'network': phase['network'],
+                    'pattern': phase['pattern'],
+                    'fault': phase['fault'],
+                    'statistics': emulator.get_statistics()
+                })
+        except KeyboardInterrupt:
+            print("\n🛑 Остановка по запросу пользователя")
+        finally:
+            emulator.is_running = False
+        return report
+
+class AsyncEmulatorHost:
+    """
+    Хост эмуляторов на asyncio: сотни камер в одном процессе
+    """
+    
+    def __init__(self, target_fps: int = 25, render_frames: bool = True):
+        self.target_fps = target_fps
+        self.render_frames = render_frames
+        self.cameras: Dict[str, CameraEmulator720p] = {}
+        self.is_running = False
+        self.start_time = 0.0
+        # Насколько позже плана просыпаются таймеры (перегрузка хоста)
+        self.tick_lag_total = 0.0
+        self.tick_lag_max = 0.0
+        self.ticks = 0
+    
+    def add_camera(self, camera_id: str, network_profile: Optional[Dict] = None,
+                   pattern: str = "stream_info") -> CameraEmulator720p:
+        """Добавление камеры со своим сетевым профилем (параметры как в set_network_parameters)"""
+        emulator = CameraEmulator720p(target_fps=self.target_fps, quiet=True)
+        if network_profile:
+            emulator.set_network_parameters(**network_profile)
+        emulator.set_display_pattern(pattern)
+        self.cameras[camera_id] = emulator
+        return emulator
+    
+    @staticmethod
+    def random_network_profile() -> Dict:
+        """Случайный сетевой профиль для нагрузочного теста"""
+        return {
+            'packet_loss': random.choice([0.0, 0.1, 0.5, 1.0, 3.0]),
+            'latency_ms': random.uniform(5, 80),
+            'jitter_ms': random.uniform(0, 10),
+            'freeze_probability': random.choice([0.0, 0.05, 0.1, 1.0]),
+            'bitrate_kbps': random.choice([800, 1500, 2500, 4000]),
+        }
+    
+    async def _run_camera(self, camera_id: str, emulator: CameraEmulator720p, end_time: float,
+                          on_frame: Optional[Callable[[str, List[str]], None]]):
+        """Цикл одной камеры: кадр, сетевые эффекты и ожидание следующего кадра"""
+        loop = asyncio.get_running_loop()
+        target_frame_time = 1.0 / self.target_fps
+        # Разносим старт камер, чтобы все таймеры не срабатывали одновременно
+        await asyncio.sleep(random.uniform(0, target_frame_time))
+        next_frame = loop.time()
+        
+        while self.is_running and loop.time() < end_time:
+            lag = loop.time() - next_frame
+            if lag > 0:
+                self.tick_lag_total += lag
+                self.tick_lag_max = max(self.tick_lag_max, lag)
+            self.ticks += 1
+            
+            emulator.frame_timestamp = time.time()
+            emulator.stats['frames_generated'] += 1
+            frame = await emulator.generate_frame_async(self.render_frames)
+            if frame is not None:
+                emulator.stats['frames_displayed'] += 1
+                emulator._account_frame_time(loop.time())
+                emulator.frame_count += 1
+                if on_frame:
+                    on_frame(camera_id, frame)
+            
+            # Поддержание FPS: следующий кадр по расписанию, без накопления дрейфа
+            next_frame = max(next_frame + target_frame_time, loop.time() - target_frame_time)
+            await asyncio.sleep(max(0, next_frame - loop.time()))
+    
+    async def run(self, duration: float, on_frame: Optional[Callable[[str, List[str]], None]] = None):
+        """Запуск всех камер на duration секунд"""
+        if self.is_running:
+            print("⚠️  Хост уже запущен")
+            return
+        
+        self.is_running = True
+        self.start_time = time.time()
+        self.tick_lag_total = 0.0
+        self.tick_lag_max = 0.0
+        self.ticks = 0
+        for emulator in self.cameras.values():
+            emulator.frame_count = 0
+            emulator._reset_stats(self.start_time)
+        
+        end_time = asyncio.get_running_loop().time() + duration
+        try:
+            await asyncio.gather(*(
+                self._run_camera(camera_id, emulator, end_time, on_frame)
+                for camera_id, emulator in self.cameras.items()
+            ))
+        finally:
+            self.is_running = False
+    
+    def stop(self):
+        """Остановка всех камер после текущего кадра"""
+        self.is_running = False
+    
+    def get_aggregated_statistics(self) -> Dict:
+        """Сводная статистика по всем камерам"""
+        elapsed = max(time.time() - self.start_time, 1e-9) if self.start_time else 0
+        totals = {
+            'cameras': len(self.cameras),
+            'total_frames': 0,
+            'frames_displayed': 0,
+            'frames_lost': 0,
+            'frames_skipped': 0,
+            'freezes_detected': 0,
+        }
+        total_latency = 0.0
+        camera_fps = []
+        # P² не объединяется между камерами - в сводке худшая камера
+        latency_p99 = []
+        fps_p1 = []
+        for emulator in self.cameras.values():
+            stats = emulator.stats
+            totals['total_frames'] += stats['frames_generated']
+            totals['frames_displayed'] += stats['frames_displayed']
+            totals['frames_lost'] += stats['frames_lost']
+            totals['frames_skipped'] += stats['frames_skipped']
+            totals['freezes_detected'] += stats['freezes_detected']
+            total_latency += stats['total_latency']
+            if elapsed:
+                camera_fps.append(stats['frames_displayed'] / elapsed)
+            latency_summary = emulator.latency_quantiles.summary()
+            if latency_summary:
+                latency_p99.append(latency_summary['p99'])
+            fps_summary = emulator.fps_quantiles.summary(2)
+            if fps_summary:
+                fps_p1.append(fps_summary['p1'])
+        
+        totals.update({
+            'packet_loss_rate': (totals['frames_lost'] / totals['total_frames']) * 100 if totals['total_frames'] > 0 else 0,
+            'avg_latency': total_latency / totals['frames_displayed'] if totals['frames_displayed'] > 0 else 0,
+            'aggregate_fps': totals['frames_displayed'] / elapsed if elapsed else 0,
+            'min_camera_fps': min(camera_fps) if camera_fps else 0,
+            'avg_camera_fps': sum(camera_fps) / len(camera_fps) if camera_fps else 0,
+            'max_camera_fps': max(camera_fps) if camera_fps else 0,
+            'avg_tick_lag_ms': (self.tick_lag_total / self.ticks) * 1000 if self.ticks else 0,
+            'max_tick_lag_ms': self.tick_lag_max * 1000,
+            'worst_latency_p99': max(latency_p99) if latency_p99 else 0,
+            'worst_fps_p1': min(fps_p1) if fps_p1 else 0,
+            'elapsed_time': elapsed
+        })
+        return totals
+    
+    def show_stats(self):
+        """Показать сводную статистику"""
+        stats = self.get_aggregated_statistics()
+        
+        print("\n" + "=" * 50)
+        print(f"📊 СТАТИСТИКА ХОСТА ({stats['cameras']} камер)")
+        print("=" * 50)
+        print(f"🎯 Всего кадров: {stats['total_frames']}")
+        print(f"✅ Отображено: {stats['frames_displayed']}")
+        print(f"❌ Потеряно: {stats['frames_lost']}")
+        print(f"📉 Потери: {stats['packet_loss_rate']:.2f}%")
+        print(f"⏱️  Задержка: {stats['avg_latency']:.2f}ms")
+        print(f"❄️  Фризов: {stats['freezes_detected']}")
+        print(f"🎞️  Суммарный FPS: {stats['aggregate_fps']:.1f}")
+        print(f"📈 FPS камеры min/avg/max: {stats['min_camera_fps']:.2f}/"
+              f"{stats['avg_camera_fps']:.2f}/{stats['max_camera_fps']:.2f}")
+        print(f"⏳ Опоздание таймеров avg/max: {stats['avg_tick_lag_ms']:.1f}/{stats['max_tick_lag_ms']:.1f}ms")
+        print(f"📉 Худшая камера: задержка p99 {stats['worst_latency_p99']:.1f}ms, FPS p1 {stats['worst_fps_p1']:.2f}")
+        print("=" * 50)
+
+class FrameRenderer:
+    """
+    Растеризация текстового кадра в изображение 1280×720 (BGR) для отдачи в VideoCapture
+    """
+    
+    # Замена псевдографики на ASCII (шрифты OpenCV знают только ASCII)
+    ASCII_MAP = str.maketrans({
+        '┌': '+', '┐': '+', '└': '+', '┘': '+', '├': '+', '┤': '+',
+        '─': '-', '│': '|', '×': 'x', '±': '+',
+    })
+    # Яркость ячеек для блочных символов
+    BLOCK_LEVELS = {'█': 255, '▓': 190, '▒': 128, '░': 64}
+    BACKGROUND = 48
+    WORD_RE = re.compile(r'\S+')
+    
+    def __init__(self, width: int = 1280, height: int = 720):
+        if cv2 is None:
+            raise RuntimeError("Для отдачи кадров нужны OpenCV и NumPy: pip install opencv-python numpy")
+        self.width = width
+        self.height = height
+    
+    def render(self, lines: List[str]) -> "np.ndarray":
+        """Текстовый кадр -> изображение"""
+        rows = len(lines)
+        cols = max((len(line) for line in lines), default=1)
+        cell_h = self.height / max(rows, 1)
+        
+        # Блочные символы - одной матрицей яркостей с масштабированием.
+        # Фон темно-серый, а не черный: исправный кадр не должен считаться "черным экраном"
+        cells = np.full((rows, cols), self.BACKGROUND, dtype=np.uint8)
+        text_lines = []
+        for r, line in enumerate(lines):
+            chars = []
+            for c, ch in enumerate(line):
+                level = self.BLOCK_LEVELS.get(ch)
+                if level is not None:
+                    cells[r, c] = level
+                    chars.append(' ')
+                else:
+                    chars.append(ch)
+            text = ''.join(chars).translate(self.ASCII_MAP)
+            # Прочие не-ASCII символы (эмодзи, кириллица) - пробелы, чтобы не сдвигать колонки
+            text_lines.append(''.join(ch if ord(ch) < 128 else ' ' for ch in text))
+        
+        gray = cv2.resize(cells, (self.width, self.height), interpolation=cv2.INTER_NEAREST)
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        
+        # Текст - по словам в позиции своей колонки (шрифт OpenCV не моноширинный)
+        cell_w = self.width / max(cols, 1)
+        scale = cell_h / 20.0
+        for r, text in enumerate(text_lines):
+            y = int((r + 0.8) * cell_h)
+            for match in self.WORD_RE.finditer(text):
+                x = int(match.start() * cell_w)
+                cv2.putText(image, match.group(), (x, y), cv2.FONT_HERSHEY_PLAIN, scale, (230, 230, 230), 1, cv2.LINE_AA)
+        return image
+    
+    @staticmethod
+    def jpeg_quality(bitrate_kbps: float) -> int:
+        """Качество JPEG по битрейту: низкий битрейт - заметные артефакты сжатия"""
+        return int(max(10, min(95, bitrate_kbps / 40)))
+
+class MjpegBroadcaster:
+    """
+    Последние JPEG-кадры по камерам для HTTP-клиентов.
+    Растеризация и JPEG - в пуле потоков: цикл asyncio хоста и шаги сценария их не ждут
+    """
+    
+    def __init__(self, renderer: FrameRenderer, workers: Optional[int] = None):
+        self.renderer = renderer
+        self.frames: Dict[str, bytes] = {}
+        self.sequence: Dict[str, int] = {}
+        self.clients: Dict[str, int] = {}
+        self.encoding = set()  # Камеры, чей кадр сейчас кодируется
+        self.condition = threading.Condition()
+        # OpenCV отпускает GIL при растеризации и сжатии - потоки кодируют параллельно
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4,
+                                           thread_name_prefix='mjpeg')
+    
+    def has_clients(self, camera_id: str) -> bool:
+        return self.clients.get(camera_id, 0) > 0 or camera_id not in self.frames
+    
+    def publish(self, camera_id: str, lines: List[str], bitrate_kbps: float,
+                captured_at: Optional[float] = None, fault: bool = False):
+        """
+        Новый кадр камеры; кодируется в пуле потоков и только если его кто-то смотрит.
+        Пока предыдущий кадр камеры кодируется, новый пропускается (как у перегруженной камеры):
+        очередь не растет, а порядок кадров камеры сохраняется
+        """
+        with self.condition:
+            if not self.has_clients(camera_id):
+                return
+            if camera_id in self.encoding:
+                return
+            self.encoding.add(camera_id)
+            sequence = self.sequence.get(camera_id, 0) + 1
+        # Время создания кадра - до сетевых задержек и кодирования
+        captured_at = captured_at if captured_at is not None else time.time()
+        args = (lines, bitrate_kbps, sequence, captured_at, fault)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None  # Синхронный поток или сценарий
+        if loop is not None:
+            future = loop.run_in_executor(self.executor, self._encode, *args)
+        else:
+            future = self.executor.submit(self._encode, *args)
+        future.add_done_callback(lambda done: self._store(camera_id, sequence, done))
+    
+    def _encode(self, lines: List[str], bitrate_kbps: float, sequence: int, captured_at: float,
+                fault: bool) -> Optional[bytes]:
+        """Текстовый кадр -> JPEG с пиксельной меткой (номер, время создания, флаг неисправности)"""
+        image = self.renderer.render(lines)
+        encode_watermark(image, sequence, int(captured_at * 1000), fault)
+        ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, FrameRenderer.jpeg_quality(bitrate_kbps)])
+        return jpeg.tobytes() if ok else None
+    
+    def _store(self, camera_id: str, sequence: int, future):
+        """Готовый JPEG - клиентам камеры"""
+        jpeg = None
+        if not future.cancelled():
+            error = future.exception()
+            if error is not None:
+                print(f"❌ Ошибка кодирования кадра {camera_id}: {error}")
+            else:
+                jpeg = future.result()
+        with self.condition:
+            self.encoding.discard(camera_id)
+            if jpeg is None:
+                return
+            self.frames[camera_id] = jpeg
+            self.sequence[camera_id] = sequence
+            self.condition.notify_all()
+    
+    def wait_frame(self, camera_id: str, last_sequence: int, timeout: float = 5.0):
+        """Ожидание кадра новее last_sequence -> (sequence, jpeg) или None"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence.get(camera_id, 0) > last_sequence, timeout)
+            sequence = self.sequence.get(camera_id, 0)
+            if sequence <= last_sequence:
+                return None
+            return sequence, self.frames[camera_id]
+
+class MjpegServer:
+    """
+    Локальный MJPEG-over-HTTP сервер: http://127.0.0.1:<port>/<camera_id>.mjpg
+    """
+    
+    def __init__(self, port: int, broadcaster: MjpegBroadcaster, default_camera: str = "cam_001"):
+        self.port = port
+        self.broadcaster = broadcaster
+        self.default_camera = default_camera
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.httpd.daemon_threads = True
+    
+    def _make_handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                name = self.path.split('?')[0].strip('/')
+                if name == 'stream.mjpg':
+                    name = f"{server.default_camera}.mjpg"
+                if name.endswith('.mjpg'):
+                    self._stream(name[:-len('.mjpg')])
+                elif name.endswith('.jpg'):
+                    self._snapshot(name[:-len('.jpg')])
+                else:
+                    self.send_error(404)
+            
+            def _snapshot(self, camera_id):
+                frame = server.broadcaster.frames.get(camera_id)
+                if frame is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(frame)))
+                self.end_headers()
+                self.wfile.write(frame)
+            
+            def _stream(self, camera_id):
+                broadcaster = server.broadcaster
+                self.send_response(200)
+                self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                with broadcaster.condition:
+                    broadcaster.clients[camera_id] = broadcaster.clients.get(camera_id, 0) + 1
+                last_sequence = 0
+                try:
+                    while True:
+                        item = broadcaster.wait_frame(camera_id, last_sequence)
+                        if item is None:
+                            continue
+                        last_sequence, frame = item
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                         + f"Content-Length: {len(frame)}\r\n\r\n".encode('ascii')
+                                         + frame + b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with broadcaster.condition:
+                        broadcaster.clients[camera_id] -= 1
+        
+        return Handler
+    
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+        print(f"📡 MJPEG: http://127.0.0.1:{self.port}/{self.default_camera}.mjpg")
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def start_mjpeg_server(port: int) -> MjpegBroadcaster:
+    """Запуск HTTP-сервера кадров; возвращает broadcaster для публикации"""
+    broadcaster = MjpegBroadcaster(FrameRenderer())
+    MjpegServer(port, broadcaster).start()
+    return broadcaster
+
+def run_host(cameras: int, duration: float, render_frames: bool = True, serve_port: Optional[int] = None):
+    """Запуск хоста с cameras эмуляторами со случайными профилями сети"""
+    host = AsyncEmulatorHost(target_fps=25, render_frames=render_frames or bool(serve_port))
+    for i in range(cameras):
+        host.add_camera(f"cam_{i + 1:03d}", AsyncEmulatorHost.random_network_profile())
+    
+    on_frame = None
+    if serve_port:
+        broadcaster = start_mjpeg_server(serve_port)
+        on_frame = lambda camera_id, frame: broadcaster.publish(
+            camera_id, frame, host.cameras[camera_id].network_params['bitrate_kbps'],
+            host.cameras[camera_id].frame_timestamp)
+    
+    print(f"🎥 Запуск {cameras} эмулируемых камер на {duration} секунд")
+    print("⏹️  Для остановки нажмите Ctrl+C")
+    try:
+        asyncio.run(host.run(duration, on_frame))
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка по запросу пользователя")
+    finally:
+        host.show_stats()
+
+def run_simulation(duration: float, seed: int, as_json: bool = False):
+    """Прогон эмулятора в виртуальном времени с фиксированным seed"""
+    emulator = CameraEmulator720p(quiet=as_json)
+    emulator.enable_simulation(seed)
+    emulator.start_stream(duration)
+    if as_json:
+        # Только статистика, без баннеров - удобно сравнивать в регрессионных тестах
+        print(json.dumps(emulator.get_statistics(), ensure_ascii=False, indent=2))
+
+def run_served_stream(duration: float, serve_port: int):
+    """Один эмулятор без вывода на экран, кадры отдаются по HTTP"""
+    emulator = CameraEmulator720p()
+    broadcaster = start_mjpeg_server(serve_port)
+    emulator.quiet = True
+    emulator.is_running = True
+    emulator._reset_stats(emulator.clock.time())
+    print(f"🎥 Поток 1280×720 @ {emulator.target_fps}FPS на {duration} секунд")
+    print("⏹️  Для остановки нажмите Ctrl+C")
+    try:
+        emulator._stream_loop(emulator.clock.time() + duration, lambda frame: broadcaster.publish(
+            "cam_001", frame, emulator.network_params['bitrate_kbps'], emulator.frame_timestamp))
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка по запросу пользователя")
+    finally:
+        emulator.is_running = False
+        emulator._show_stats()
+
+def run_scenario(path: str, report_path: Optional[str], simulate: bool, seed: Optional[int],
+                 serve_port: Optional[int] = None):
+    """Прогон сценария без интерфейса с записью отчета по фазам"""
+    scenario = ScenarioRunner.load(path)
+    if seed is not None:
+        scenario['seed'] = seed
+    
+    emulator = CameraEmulator720p(quiet=True, seed=scenario.get('seed'))
+    if simulate or scenario.get('simulate'):
+        emulator.enable_simulation(scenario.get('seed') or 0)
+    
+    runner = ScenarioRunner(emulator, scenario)
+    on_frame = None
+    if serve_port:
+        if emulator.simulation:
+            raise SystemExit("❌ --serve работает только в реальном времени (без --simulate)")
+        broadcaster = start_mjpeg_server(serve_port)
+        on_frame = lambda frame: broadcaster.publish("cam_001", frame, emulator.network_params['bitrate_kbps'],
+                                                     emulator.frame_timestamp, emulator.fault_active)
+    
+    print(f"🎬 Сценарий '{scenario.get('name', path)}': {len(runner.phases)} фаз"
+          f"{' (симуляция)' if emulator.simulation else ''}")
+    report = runner.run(on_frame)
+    
+    report_json = json.dumps(report, ensure_ascii=False, indent=2)
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report_json)
+        print(f"📄 Отчет сохранен: {report_path}")
+    else:
+        print(report_json)
+
 def main():
     """Главная функция"""
     emulator = CameraEmulator720p(
@@ -594,4 +1367,29 @@ def main():
             print("❌ Неверный выбор")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Эмулятор камеры 1280×720")
+    parser.add_argument("--host", type=int, metavar="N",
+                        help="запустить N эмулируемых камер в одном процессе (asyncio)")
+    parser.add_argument("--duration", type=float, default=60, help="длительность в секундах (для --host и --simulate)")
+    parser.add_argument("--no-render", action="store_true",
+                        help="не генерировать текстовые кадры (только сетевые эффекты)")
+    parser.add_argument("--simulate", action="store_true",
+                        help="виртуальное время: --duration секунд потока считается без ожидания")
+    parser.add_argument("--seed", type=int, help="seed генератора случайных чисел (для --simulate и --scenario)")
+    parser.add_argument("--json", action="store_true", help="вывести статистику симуляции в JSON")
+    parser.add_argument("--scenario", metavar="FILE", help="сценарий сетевых условий (JSON/YAML), запуск без меню")
+    parser.add_argument("--report", metavar="FILE", help="JSON-отчет по фазам сценария")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="отдавать кадры как MJPEG по HTTP: http://127.0.0.1:PORT/cam_001.mjpg")
+    args = parser.parse_args()
+    
+    if args.scenario:
+        run_scenario(args.scenario, args.report, args.simulate, args.seed, serve_port=args.serve)
+    elif args.host:
+        run_host(args.host, args.duration, render_frames=not args.no_render, serve_port=args.serve)
+    elif args.serve:
+        run_served_stream(args.duration, args.serve)
+    elif args.simulate:
+        run_simulation(args.duration, args.seed or 0, as_json=args.json)
+    else:
+        main()
\ No newline at end of file